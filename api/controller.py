@@ -1,11 +1,18 @@
 # api/controller.py
 
+import os
+import json
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import StreamingResponse
+from typing import Optional
 from pydantic import BaseModel
 from fastapi.middleware.cors import CORSMiddleware
 # import gradio as gr
-from src.llm_client import LLMClient
-from src.summary_manager import SummaryManager
+from src.llm_client import LLMClient, LLMError
+from src.summary_manager import SummaryManager, SummaryDelta
+from src.ingestion import get_ingestion_worker
+from src.llm_scheduler import get_llm_scheduler
+from src.feed_health import get_feed_health
 
 # ---------- API MODELS ----------
 class SummarizeRequest(BaseModel):
@@ -15,10 +22,15 @@ class SummarizeRequest(BaseModel):
     audience: str
     days_limit: int = 1
     top_entries: int = 5
+    only_new: bool = True  # skip entries already summarized for this API key and digest
+    max_entries: Optional[int] = None  # most relevant entries sent to the LLM (0 = all; default RANK_MAX_ENTRIES)
+    token_budget: Optional[int] = None  # or cap them by entry tokens (0 = no cap)
 
 class SummarizeEntryRequest(BaseModel):
     api_key: str
-    selection: int  # 1-based index from the UI list, or pass the raw entry index you prefer
+    link: Optional[str] = None  # link of the entry as listed by /api/summarize (preferred)
+    selection: Optional[int] = None  # or a 1-based index into the stored window, newest first
+    days_limit: int = 1
     subject_area: str
     content_type: str
     audience: str
@@ -38,11 +50,24 @@ app.add_middleware(
 # Mount Gradio UI at the root path
 # app = gr.mount_gradio_app(app, ui, path="/")
 
+# ---------- BACKGROUND INGESTION ----------
+@app.on_event("startup")
+def start_background_ingestion():
+    # Opt-in: keeps the entry store warm so summarize calls skip feed downloads
+    if os.getenv("BACKGROUND_INGEST", "0") == "1":
+        get_ingestion_worker().start()
+
+@app.on_event("shutdown")
+def stop_background_ingestion():
+    worker = get_ingestion_worker()
+    if worker.is_running():
+        worker.stop()
+
 # ---------- HELPERS ----------
 def _run_bulk_summarize(req: SummarizeRequest):
     # reuse your existing code paths; run once and collect final result
     llm = LLMClient(api_key=req.api_key)
-    mgr = SummaryManager(llm)
+    mgr = SummaryManager(llm, only_new=req.only_new)
 
     result_obj = None
     for result in mgr.summarize(
@@ -51,17 +76,24 @@ def _run_bulk_summarize(req: SummarizeRequest):
         audience_key=req.audience,
         days_limit=req.days_limit,
         top_k=req.top_entries,
-        summarize_top_entries=False
+        summarize_top_entries=False,
+        max_entries=req.max_entries,
+        token_budget=req.token_budget
     ):
         if isinstance(result, dict):
             result_obj = result
 
+    return _bulk_payload(result_obj)
+
+def _bulk_payload(result_obj):
     if not result_obj:
         return {
             "bulk_summary": "No new articles found.",
             "bulk_cost": 0.0,
             "total_entries": 0,
-            "entries": []
+            "summarized_entries": 0,
+            "entries": [],
+            "stage_stats": {}
         }
 
     # Normalize to a stable JSON shape the proxy/WordPress can consume
@@ -74,12 +106,58 @@ def _run_bulk_summarize(req: SummarizeRequest):
 
     return {
         "bulk_summary": result_obj.get("bulk_summary") or "No new articles found.",
-        "bulk_cost": float(result_obj.get("bulk_cost", 0.0)),
+        "bulk_cost": float(result_obj.get("bulk_cost") or 0.0),
         "total_entries": int(result_obj.get("total_entries", 0)),
-        "entries": entries
+        # Entries kept after relevance ranking and sent to the LLM
+        "summarized_entries": int(result_obj.get("summarized_entries", result_obj.get("total_entries", 0))),
+        "entries": entries,
+        # model, calls, cost and seconds per LLM stage (map / reduce / entry)
+        "stage_stats": result_obj.get("stage_stats", {})
     }
 
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def _stream_bulk_summarize(req: SummarizeRequest):
+    """SSE events for one summarize run: progress messages, text deltas, then the result."""
+    llm = LLMClient(api_key=req.api_key)
+    mgr = SummaryManager(llm, only_new=req.only_new)
+
+    result_obj = None
+    try:
+        for result in mgr.summarize(
+            subject_area=req.subject_area,
+            content_type=req.content_type,
+            audience_key=req.audience,
+            days_limit=req.days_limit,
+            top_k=req.top_entries,
+            summarize_top_entries=False,
+            max_entries=req.max_entries,
+            token_budget=req.token_budget
+        ):
+            if isinstance(result, str):
+                yield _sse("progress", {"message": result})
+            elif isinstance(result, SummaryDelta):
+                yield _sse("delta", {"stage": result.stage, "text": result.text})
+            elif isinstance(result, dict):
+                result_obj = result
+        yield _sse("result", _bulk_payload(result_obj))
+    except Exception as e:
+        yield _sse("error", {"detail": str(e)})
+
 # ---------- API ROUTES ----------
+@app.get("/api/feeds/health")
+def feeds_health():
+    return get_feed_health().snapshot()
+
+@app.get("/api/ingest/status")
+def ingest_status():
+    return get_ingestion_worker().status()
+
+@app.get("/api/llm/scheduler")
+def llm_scheduler_status():
+    return get_llm_scheduler().snapshot()
+
 @app.post("/api/summarize")
 def api_summarize(req: SummarizeRequest):
     try:
@@ -88,9 +166,22 @@ def api_summarize(req: SummarizeRequest):
         return _run_bulk_summarize(req)
     except HTTPException:
         raise
+    except LLMError as e:
+        raise HTTPException(status_code=502, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/summarize/stream")
+def api_summarize_stream(req: SummarizeRequest):
+    # Same request as /api/summarize, answered as Server-Sent Events (progress, delta, result)
+    if not req.api_key:
+        raise HTTPException(status_code=400, detail="Missing API key")
+    return StreamingResponse(
+        _stream_bulk_summarize(req),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 @app.post("/api/summarize_entry")
 def api_summarize_entry(req: SummarizeEntryRequest):
     try:
@@ -100,21 +191,11 @@ def api_summarize_entry(req: SummarizeEntryRequest):
         llm = LLMClient(api_key=req.api_key)
         mgr = SummaryManager(llm)
 
-        # We need an entry to summarize; a simple approach is to re-fetch the same bulk
-        bulk = _run_bulk_summarize(SummarizeRequest(
-            api_key=req.api_key,
-            subject_area=req.subject_area,
-            content_type=req.content_type,
-            audience=req.audience,
-            days_limit=1,
-            top_entries=10
-        ))
-
-        entries = bulk.get("entries", [])
-        idx = max(0, min(len(entries)-1, req.selection - 1))
-        entry = entries[idx] if entries else None
+        # Read the entry back from the entry store; no second bulk run
+        entry = mgr.find_entry(req.subject_area, req.content_type, link=req.link,
+                               selection=req.selection, days_limit=req.days_limit)
         if not entry:
-            raise HTTPException(status_code=404, detail="No entries found")
+            raise HTTPException(status_code=404, detail="Entry not found")
 
         # Prepare the shape expected by your existing summarize_selected()
         raw_like = {
@@ -133,12 +214,15 @@ def api_summarize_entry(req: SummarizeEntryRequest):
 
         return {
             "title": entry["title"],
-            "published": entry["published"],
+            "published": str(entry["published"]),
             "link": entry["link"],
             "summary": result.get("summary", ""),
-            "cost": float(result.get("cost", 0.0))
+            "cost": float(result.get("cost", 0.0)),
+            "cached": result.get("cached", False)
         }
     except HTTPException:
         raise
+    except LLMError as e:
+        raise HTTPException(status_code=502, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -1,14 +1,21 @@
 import time
 import gradio as gr
 from src.config import Config
-from src.llm_client import LLMClient
-from src.summary_manager import SummaryManager
+from src.llm_client import LLMClient, LLMError
+from src.summary_manager import SummaryManager, SummaryDelta
+from src.relevance import RANK_MAX_ENTRIES
+from src.llm_scheduler import get_llm_scheduler
+from src.feed_health import get_feed_health, format_health_line
+from src.ingestion import get_ingestion_worker
 import pandas as pd 
 import io
 # from src.response_parser import export_entries_to_csv
 import tempfile
 import os
+import json
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import StreamingResponse
+from typing import Optional
 from pydantic import BaseModel
 from fastapi.middleware.cors import CORSMiddleware
 
@@ -24,7 +31,13 @@ def get_feeds(subject, ctype):
     feeds = Config.SUBJECT_AREAS.get(subject, {}).get(ctype, [])
     if not feeds:
         return "_No feeds configured for this selection._"
-    return "\n".join([f"- {url}" for url in feeds])
+    return feeds_markdown(feeds)
+
+
+def feeds_markdown(feeds):
+    """Feed list with each feed's recent health (latency, errors, circuit state)."""
+    health = get_feed_health().snapshot(feeds)
+    return "\n".join([format_health_line(url, health[url]) for url in feeds])
 
 
 def handle_export(entry_table_df):
@@ -41,7 +54,7 @@ def handle_export(entry_table_df):
 # ----------------------------
 # Main Summarization
 # ----------------------------
-def summarize_ui(api_key, subject_area, content_type, audience, days_limit, top_entries):
+def summarize_ui(api_key, subject_area, content_type, audience, days_limit, top_entries, max_entries=0, only_new=True):
     global session_mgr
     if not api_key:
         return (
@@ -54,10 +67,10 @@ def summarize_ui(api_key, subject_area, content_type, audience, days_limit, top_
         )
 
     llm = LLMClient(api_key=api_key)
-    session_mgr = SummaryManager(llm)
+    session_mgr = SummaryManager(llm, only_new=only_new)
 
     feeds = Config.SUBJECT_AREAS[subject_area][content_type]
-    feed_list_md = "\n".join([f"- {url}" for url in feeds]) or "_No feeds configured._"
+    feed_list_md = feeds_markdown(feeds) or "_No feeds configured._"
 
     yield (
         "",
@@ -70,35 +83,61 @@ def summarize_ui(api_key, subject_area, content_type, audience, days_limit, top_
     )
 
     progress_text = ""
+    streamed_bulk = ""
     result_obj = None
 
     # Run summarization and stream progress messages
-    for result in session_mgr.summarize(
-        subject_area=subject_area,
-        content_type=content_type,
-        audience_key=audience,
-        days_limit=days_limit,
-        top_k=top_entries,
-        summarize_top_entries=False
-    ):
-        if isinstance(result, str):
-            progress_text += result + "\n"
-            yield (
-                gr.update(),  # bulk_output
-                gr.update(choices=[], visible=False),
-                None,
-                f"### Progress Log\n{progress_text}",
-                feed_list_md,
-                gr.update(visible=True, value=result),
-                []
-            )
-        elif isinstance(result, dict):
-            result_obj = result
+    try:
+        for result in session_mgr.summarize(
+            subject_area=subject_area,
+            content_type=content_type,
+            audience_key=audience,
+            days_limit=days_limit,
+            top_k=top_entries,
+            summarize_top_entries=False,
+            max_entries=int(max_entries)
+        ):
+            if isinstance(result, str):
+                progress_text += result + "\n"
+                yield (
+                    gr.update(),  # bulk_output
+                    gr.update(choices=[], visible=False),
+                    None,
+                    f"### Progress Log\n{progress_text}",
+                    feed_list_md,
+                    gr.update(visible=True, value=result),
+                    []
+                )
+            elif isinstance(result, SummaryDelta) and result.stage == "bulk":
+                # Show the overall summary as it is written
+                streamed_bulk += result.text
+                yield (
+                    streamed_bulk,
+                    gr.update(choices=[], visible=False),
+                    None,
+                    f"### Progress Log\n{progress_text}",
+                    feed_list_md,
+                    gr.update(visible=True, value="✍️ Writing overall summary..."),
+                    []
+                )
+            elif isinstance(result, dict):
+                result_obj = result
+    except LLMError as e:
+        yield (
+            f"❌ {e}",
+            gr.update(choices=[], visible=False),
+            None,
+            f"❌ Summarization failed: {e}\n\n### Progress Log\n{progress_text}",
+            feed_list_md,
+            gr.update(visible=False),
+            []
+        )
+        return
 
     # Process results
     if result_obj:
         bulk = result_obj.get("bulk_summary") or "No new articles found."
-        cost = result_obj.get("bulk_cost", 0.0)
+        cost = result_obj.get("bulk_cost") or 0.0
         total_entries = result_obj.get("total_entries", 0)
         raw_entries = result_obj.get("raw_entries", [])
 
@@ -139,25 +178,37 @@ def summarize_ui(api_key, subject_area, content_type, audience, days_limit, top_
 def detailed_summary(raw_entries, selection, subject, audience, ctype):
     """Summarize a single selected entry."""
     if not raw_entries:
-        return "⚠️ No entries available. Run summarization first."
+        yield "⚠️ No entries available. Run summarization first."
+        return
     if not selection:
-        return "⚠️ Please select an entry."
+        yield "⚠️ Please select an entry."
+        return
 
     index = int(selection.split(".")[0]) - 1
     entry = raw_entries[index]
     if not session_mgr:
-        return "⚠️ Internal error: Session not initialized."
+        yield "⚠️ Internal error: Session not initialized."
+        return
 
-    result = session_mgr.summarize_selected(entry, subject, audience, ctype)
-    return f"""
+    header = f"""
 ### {entry['title']}
 📅 {entry.get('published', '')}
 🔗 [Link]({entry['link']})
 
 **Summary:**
-{result['summary']}
-
-💰 Cost: ${result['cost']:.4f}
+"""
+    streamed = ""
+    try:
+        for result in session_mgr.iter_summarize_selected(entry, subject, audience, ctype):
+            if isinstance(result, SummaryDelta):
+                streamed += result.text
+                yield header + streamed
+    except LLMError as e:
+        yield header + f"❌ {e}"
+        return
+    yield header + f"""{result['summary']}
+
+💰 Cost: ${result['cost']:.4f}{" (cached)" if result.get("cached") else ""}
 """
 
 # ----------------------------
@@ -198,6 +249,8 @@ with gr.Blocks(
         api_key = gr.Textbox(label="🔑 OpenAI API Key", type="password", placeholder="sk-...")
         days = gr.Slider(1, 7, value=1, step=1, label="Days Window")
         top = gr.Slider(5, 30, value=5, step=1, label="Top Entries")
+        max_entries = gr.Slider(0, 500, value=RANK_MAX_ENTRIES, step=10, label="Max Entries Summarized (0 = all, most relevant first)")
+        only_new = gr.Checkbox(value=True, label="Only entries not yet summarized for this digest")
 
     with gr.Row():
         subject = gr.Dropdown(list(Config.SUBJECT_AREAS.keys()), label="🪐 Subject Area")
@@ -242,7 +295,7 @@ with gr.Blocks(
 
     summarize_btn.click(
         fn=summarize_ui,
-        inputs=[api_key, subject, ctype, audience, days, top],
+        inputs=[api_key, subject, ctype, audience, days, top, max_entries, only_new],
         outputs=[bulk_output, top_dropdown, raw_state, status, feeds_preview, loading_box, entry_table],
         show_progress=False,
         queue=True,
@@ -277,10 +330,15 @@ class SummarizeRequest(BaseModel):
     audience: str
     days_limit: int = 1
     top_entries: int = 5
+    only_new: bool = True  # skip entries already summarized for this API key and digest
+    max_entries: Optional[int] = None  # most relevant entries sent to the LLM (0 = all; default RANK_MAX_ENTRIES)
+    token_budget: Optional[int] = None  # or cap them by entry tokens (0 = no cap)
 
 class SummarizeEntryRequest(BaseModel):
     api_key: str
-    selection: int  # 1-based index from the UI list, or pass the raw entry index you prefer
+    link: Optional[str] = None  # link of the entry as listed by /api/summarize (preferred)
+    selection: Optional[int] = None  # or a 1-based index into the stored window, newest first
+    days_limit: int = 1
     subject_area: str
     content_type: str
     audience: str
@@ -297,11 +355,24 @@ fastapi_app.add_middleware(
     allow_headers=["*"],
 )
 
+# ---------- BACKGROUND INGESTION ----------
+@fastapi_app.on_event("startup")
+def start_background_ingestion():
+    # Opt-in: keeps the entry store warm so summarize calls skip feed downloads
+    if os.getenv("BACKGROUND_INGEST", "0") == "1":
+        get_ingestion_worker().start()
+
+@fastapi_app.on_event("shutdown")
+def stop_background_ingestion():
+    worker = get_ingestion_worker()
+    if worker.is_running():
+        worker.stop()
+
 # ---------- HELPERS ----------
 def _run_bulk_summarize(req: SummarizeRequest):
     # reuse your existing code paths; run once and collect final result
     llm = LLMClient(api_key=req.api_key)
-    mgr = SummaryManager(llm)
+    mgr = SummaryManager(llm, only_new=req.only_new)
 
     result_obj = None
     for result in mgr.summarize(
@@ -310,17 +381,24 @@ def _run_bulk_summarize(req: SummarizeRequest):
         audience_key=req.audience,
         days_limit=req.days_limit,
         top_k=req.top_entries,
-        summarize_top_entries=False
+        summarize_top_entries=False,
+        max_entries=req.max_entries,
+        token_budget=req.token_budget
     ):
         if isinstance(result, dict):
             result_obj = result
 
+    return _bulk_payload(result_obj)
+
+def _bulk_payload(result_obj):
     if not result_obj:
         return {
             "bulk_summary": "No new articles found.",
             "bulk_cost": 0.0,
             "total_entries": 0,
-            "entries": []
+            "summarized_entries": 0,
+            "entries": [],
+            "stage_stats": {}
         }
 
     # Normalize to a stable JSON shape the proxy/WordPress can consume
@@ -333,16 +411,62 @@ def _run_bulk_summarize(req: SummarizeRequest):
 
     return {
         "bulk_summary": result_obj.get("bulk_summary") or "No new articles found.",
-        "bulk_cost": float(result_obj.get("bulk_cost", 0.0)),
+        "bulk_cost": float(result_obj.get("bulk_cost") or 0.0),
         "total_entries": int(result_obj.get("total_entries", 0)),
-        "entries": entries
+        # Entries kept after relevance ranking and sent to the LLM
+        "summarized_entries": int(result_obj.get("summarized_entries", result_obj.get("total_entries", 0))),
+        "entries": entries,
+        # model, calls, cost and seconds per LLM stage (map / reduce / entry)
+        "stage_stats": result_obj.get("stage_stats", {})
     }
 
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def _stream_bulk_summarize(req: SummarizeRequest):
+    """SSE events for one summarize run: progress messages, text deltas, then the result."""
+    llm = LLMClient(api_key=req.api_key)
+    mgr = SummaryManager(llm, only_new=req.only_new)
+
+    result_obj = None
+    try:
+        for result in mgr.summarize(
+            subject_area=req.subject_area,
+            content_type=req.content_type,
+            audience_key=req.audience,
+            days_limit=req.days_limit,
+            top_k=req.top_entries,
+            summarize_top_entries=False,
+            max_entries=req.max_entries,
+            token_budget=req.token_budget
+        ):
+            if isinstance(result, str):
+                yield _sse("progress", {"message": result})
+            elif isinstance(result, SummaryDelta):
+                yield _sse("delta", {"stage": result.stage, "text": result.text})
+            elif isinstance(result, dict):
+                result_obj = result
+        yield _sse("result", _bulk_payload(result_obj))
+    except Exception as e:
+        yield _sse("error", {"detail": str(e)})
+
 # ---------- API ROUTES ----------
 @fastapi_app.get("/api/health")
 def health():
     return {"status": "ok"}
 
+@fastapi_app.get("/api/feeds/health")
+def feeds_health():
+    return get_feed_health().snapshot()
+
+@fastapi_app.get("/api/ingest/status")
+def ingest_status():
+    return get_ingestion_worker().status()
+
+@fastapi_app.get("/api/llm/scheduler")
+def llm_scheduler_status():
+    return get_llm_scheduler().snapshot()
+
 @fastapi_app.post("/api/summarize")
 def api_summarize(req: SummarizeRequest):
     try:
@@ -351,9 +475,22 @@ def api_summarize(req: SummarizeRequest):
         return _run_bulk_summarize(req)
     except HTTPException:
         raise
+    except LLMError as e:
+        raise HTTPException(status_code=502, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@fastapi_app.post("/api/summarize/stream")
+def api_summarize_stream(req: SummarizeRequest):
+    # Same request as /api/summarize, answered as Server-Sent Events (progress, delta, result)
+    if not req.api_key:
+        raise HTTPException(status_code=400, detail="Missing API key")
+    return StreamingResponse(
+        _stream_bulk_summarize(req),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 @fastapi_app.post("/api/summarize_entry")
 def api_summarize_entry(req: SummarizeEntryRequest):
     try:
@@ -363,21 +500,11 @@ def api_summarize_entry(req: SummarizeEntryRequest):
         llm = LLMClient(api_key=req.api_key)
         mgr = SummaryManager(llm)
 
-        # We need an entry to summarize; a simple approach is to re-fetch the same bulk
-        bulk = _run_bulk_summarize(SummarizeRequest(
-            api_key=req.api_key,
-            subject_area=req.subject_area,
-            content_type=req.content_type,
-            audience=req.audience,
-            days_limit=1,
-            top_entries=10
-        ))
-
-        entries = bulk.get("entries", [])
-        idx = max(0, min(len(entries)-1, req.selection - 1))
-        entry = entries[idx] if entries else None
+        # Read the entry back from the entry store; no second bulk run
+        entry = mgr.find_entry(req.subject_area, req.content_type, link=req.link,
+                               selection=req.selection, days_limit=req.days_limit)
         if not entry:
-            raise HTTPException(status_code=404, detail="No entries found")
+            raise HTTPException(status_code=404, detail="Entry not found")
 
         # Prepare the shape expected by your existing summarize_selected()
         raw_like = {
@@ -396,13 +523,16 @@ def api_summarize_entry(req: SummarizeEntryRequest):
 
         return {
             "title": entry["title"],
-            "published": entry["published"],
+            "published": str(entry["published"]),
             "link": entry["link"],
             "summary": result.get("summary", ""),
-            "cost": float(result.get("cost", 0.0))
+            "cost": float(result.get("cost", 0.0)),
+            "cached": result.get("cached", False)
         }
     except HTTPException:
         raise
+    except LLMError as e:
+        raise HTTPException(status_code=502, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -0,0 +1,80 @@
+"""Streaming feed parser vs feedparser on a synthetic 10k-entry feed.
+
+    python -m bench.bench_feed_stream [--entries 10000] [--days 1] [--repeat 3]
+
+Items are one hour apart, newest first, so a 1-day window keeps 24 of them and lets
+the streaming parser stop early. Both parsers are also timed on the full document
+(no early stop) and their kept items are compared.
+"""
+import time
+import argparse
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import feedparser
+
+from src.feed_stream import iter_feed_items
+
+
+def make_feed(count):
+    now = datetime.now(timezone.utc)
+    body = "<p>" + " ".join(["Some <b>synthetic</b> abstract text &amp; more words."] * 12) + "</p>"
+    items = "".join(
+        f"<item><title>Entry {i}</title><link>https://example.org/entry/{i}</link>"
+        f"<guid>https://example.org/entry/{i}</guid>"
+        f"<pubDate>{format_datetime(now - timedelta(hours=i), usegmt=True)}</pubDate>"
+        f"<description><![CDATA[{body}]]></description></item>"
+        for i in range(count)
+    )
+    return (f'<?xml version="1.0" encoding="utf-8"?><rss version="2.0"><channel>'
+            f"<title>Synthetic</title>{items}</channel></rss>").encode("utf-8")
+
+
+def feedparser_items(content, cutoff):
+    kept = []
+    for entry in feedparser.parse(content).entries:
+        published = datetime(*entry.published_parsed[:6])
+        if published > cutoff:
+            kept.append({"title": entry.get("title"), "link": entry.get("link"), "published": published})
+    return kept
+
+
+def stream_items(content, cutoff, early_stop=True):
+    return list(iter_feed_items(content, cutoff, early_stop=early_stop))
+
+
+def best_of(repeat, fn, *args, **kwargs):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args, **kwargs)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--entries", type=int, default=10000)
+    parser.add_argument("--days", type=float, default=1)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    content = make_feed(args.entries)
+    cutoff = datetime.utcnow() - timedelta(days=args.days)
+    print(f"{args.entries} entries, {len(content) / 1e6:.1f} MB, {args.days:g}-day window, best of {args.repeat}")
+
+    fp_time, fp_items = best_of(args.repeat, feedparser_items, content, cutoff)
+    early_time, early_items = best_of(args.repeat, stream_items, content, cutoff)
+    full_time, full_items = best_of(args.repeat, stream_items, content, cutoff, early_stop=False)
+
+    for name, seconds, items in (("feedparser", fp_time, fp_items),
+                                 ("stream (early stop)", early_time, early_items),
+                                 ("stream (full parse)", full_time, full_items)):
+        print(f"{name:22} {seconds * 1000:9.1f} ms  {len(items):6} kept  {fp_time / seconds:8.1f}x feedparser")
+
+    same = [(i["link"], i["published"]) for i in fp_items] == [(i["link"], i["published"]) for i in early_items]
+    print(f"kept items match feedparser: {same}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""Per-call latency of pooled OpenAI clients vs a new client per call.
+
+    python -m bench.bench_llm_client [--calls 200] [--handshake-ms 0]
+
+Starts a local OpenAI-compatible stub server and times sequential chat completions
+four ways: a new OpenAI / AsyncOpenAI client per call (each opens a fresh connection)
+against LLMClient.chat / achat, which reuse the pooled client from _ClientRegistry.
+--handshake-ms delays every new connection on the server side to stand in for the
+TCP/TLS setup of a remote API. The response cache is off, so every call is sent.
+"""
+import os
+import json
+import time
+import asyncio
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Local stub calls must not be throttled by the production rate limits
+os.environ.setdefault("LLM_RPM", "1000000")
+os.environ.setdefault("LLM_TPM", "1000000000")
+
+from openai import OpenAI, AsyncOpenAI
+
+from src.llm_client import LLMClient
+
+MESSAGES = [{"role": "user", "content": "Summarize: local benchmark request."}]
+MODEL = "gpt-4o-mini"
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body in one write, so Nagle/delayed ACK do not add ~40 ms per response
+    wbufsize = 64 * 1024
+    handshake_seconds = 0.0
+    connections = 0
+    lock = threading.Lock()
+
+    def setup(self):
+        super().setup()
+        with StubHandler.lock:
+            StubHandler.connections += 1
+        time.sleep(self.handshake_seconds)
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("content-length", 0))))
+        out = json.dumps({
+            "id": "bench", "object": "chat.completion", "created": 0, "model": body["model"],
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": "A short summary."}}],
+            "usage": {"prompt_tokens": 20, "completion_tokens": 4, "total_tokens": 24},
+        }).encode("utf-8")
+        self.send_response(200)
+        self.send_header("content-type", "application/json")
+        self.send_header("content-length", str(len(out)))
+        self.end_headers()
+        self.wfile.write(out)
+        self.wfile.flush()
+
+
+def start_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+
+def new_client_per_call(calls, base_url):
+    for _ in range(calls):
+        client = OpenAI(api_key="sk-bench", base_url=base_url, max_retries=0)
+        client.chat.completions.create(model=MODEL, messages=MESSAGES)
+        client.close()
+
+
+def pooled_chat(calls, llm):
+    for _ in range(calls):
+        llm.chat(MESSAGES)
+
+
+async def new_async_client_per_call(calls, base_url):
+    for _ in range(calls):
+        client = AsyncOpenAI(api_key="sk-bench", base_url=base_url, max_retries=0)
+        await client.chat.completions.create(model=MODEL, messages=MESSAGES)
+        await client.close()
+
+
+async def pooled_achat(calls, llm):
+    for _ in range(calls):
+        await llm.achat(MESSAGES)
+
+
+def timed(fn, *args):
+    before = StubHandler.connections
+    start = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - start, StubHandler.connections - before
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--handshake-ms", type=float, default=0.0)
+    args = parser.parse_args()
+
+    StubHandler.handshake_seconds = args.handshake_ms / 1000
+    server, base_url = start_server()
+    # The pooled clients are created by _ClientRegistry, which reads the base URL from the env
+    os.environ["OPENAI_BASE_URL"] = base_url
+    llm = LLMClient(api_key="sk-bench", model=MODEL, use_cache=False)
+    # Warm up imports and the pooled connections so only steady-state calls are timed
+    llm.chat(MESSAGES)
+    print(f"{args.calls} sequential calls per mode, {args.handshake_ms:g} ms simulated handshake")
+
+    results = [
+        ("new OpenAI per call", *timed(new_client_per_call, args.calls, base_url)),
+        ("pooled LLMClient.chat", *timed(pooled_chat, args.calls, llm)),
+        ("new AsyncOpenAI per call", *timed(lambda: asyncio.run(new_async_client_per_call(args.calls, base_url)))),
+        ("pooled LLMClient.achat", *timed(lambda: asyncio.run(pooled_achat(args.calls, llm)))),
+    ]
+    for name, seconds, connections in results:
+        print(f"{name:26} {seconds / args.calls * 1000:8.2f} ms/call  {connections:5} connection(s)")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
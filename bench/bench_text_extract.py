@@ -0,0 +1,54 @@
+"""fast_text vs bs4_text throughput on the feed HTML fixtures.
+
+    python -m bench.bench_text_extract [--entries 10000] [--repeat 3]
+
+The fixtures under tests/fixtures/feed_html are cycled to --entries summaries, each
+extractor is timed over all of them, and the number of summaries where the two
+disagree is reported (expected 0).
+"""
+import time
+import argparse
+from itertools import cycle, islice
+from pathlib import Path
+
+from src.text_extract import bs4_text, fast_text
+
+FIXTURE_DIR = Path(__file__).resolve().parent.parent / "tests" / "fixtures" / "feed_html"
+
+
+def load_fixtures():
+    return [p.read_text(encoding="utf-8") for p in sorted(FIXTURE_DIR.glob("*.html"))]
+
+
+def best_of(repeat, fn, summaries):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for markup in summaries:
+            fn(markup)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--entries", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    fixtures = load_fixtures()
+    summaries = list(islice(cycle(fixtures), args.entries))
+    print(f"{len(summaries)} summaries from {len(fixtures)} fixtures, best of {args.repeat}")
+
+    bs4_time = best_of(args.repeat, bs4_text, summaries)
+    fast_time = best_of(args.repeat, fast_text, summaries)
+    for name, seconds in (("bs4_text", bs4_time), ("fast_text", fast_time)):
+        print(f"{name:10} {seconds * 1000:9.1f} ms  {len(summaries) / seconds:10.0f} entries/s"
+              f"  {bs4_time / seconds:6.1f}x bs4")
+
+    mismatches = [i for i, markup in enumerate(fixtures) if fast_text(markup) != bs4_text(markup)]
+    print(f"fixtures where fast_text != bs4_text: {len(mismatches)}")
+
+
+if __name__ == "__main__":
+    main()
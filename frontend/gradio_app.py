@@ -7,14 +7,14 @@ from src.summary_manager import SummaryManager
 # Global manager initialized after user enters API key
 session_mgr = None
 
-def summarize_ui(api_key, subject_area, content_type, audience, days_limit):
+def summarize_ui(api_key, subject_area, content_type, audience, days_limit, only_new=True):
     global session_mgr
     if not api_key:
         return "⚠️ Please enter a valid OpenAI API key.", "", None, None
 
     try:
         llm = LLMClient(api_key=api_key)
-        session_mgr = SummaryManager(llm)
+        session_mgr = SummaryManager(llm, only_new=only_new)
 
         result = session_mgr.summarize(
             subject_area,
@@ -27,7 +27,7 @@ def summarize_ui(api_key, subject_area, content_type, audience, days_limit):
         )
 
         bulk = result.get("bulk_summary") or "No new articles found."
-        cost = result.get("bulk_cost", 0.0)
+        cost = result.get("bulk_cost") or 0.0
         bulk_with_cost = f"💰 **Estimated cost:** ${cost:.4f}\n\n" + bulk
 
         raw_entries = result.get("raw_entries", [])
@@ -57,7 +57,7 @@ def detailed_summary(raw_entries, index, subject, audience, ctype):
         **Summary:**
         {result['summary']}
 
-        💰 Cost: ${result['cost']:.4f}
+        💰 Cost: ${result['cost']:.4f}{" (cached)" if result.get("cached") else ""}
     """
 
 with gr.Blocks() as ui:
@@ -70,6 +70,7 @@ with gr.Blocks() as ui:
         ctype = gr.Dropdown(["news", "papers"], label="Content Type")
         audience = gr.Dropdown(list(Config.AUDIENCES.keys()), label="Audience")
         days = gr.Slider(1, 7, value=1, step=1, label="Days Window")
+        only_new = gr.Checkbox(value=True, label="Only entries not yet summarized for this digest")
 
     summarize_btn = gr.Button("🔍 Summarize Latest")
 
@@ -80,7 +81,7 @@ with gr.Blocks() as ui:
 
     summarize_btn.click(
         fn=summarize_ui,
-        inputs=[api_key, subject, ctype, audience, days],
+        inputs=[api_key, subject, ctype, audience, days, only_new],
         outputs=[bulk_output, top_list, raw_state, status]
     )
 
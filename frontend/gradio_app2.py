@@ -1,8 +1,10 @@
 import time
 import gradio as gr
 from src.config import Config
-from src.llm_client import LLMClient
-from src.summary_manager import SummaryManager
+from src.llm_client import LLMClient, LLMError
+from src.summary_manager import SummaryManager, SummaryDelta
+from src.relevance import RANK_MAX_ENTRIES
+from src.feed_health import get_feed_health, format_health_line
 import pandas as pd 
 import io
 # from src.response_parser import export_entries_to_csv
@@ -21,7 +23,13 @@ def get_feeds(subject, ctype):
     feeds = Config.SUBJECT_AREAS.get(subject, {}).get(ctype, [])
     if not feeds:
         return "_No feeds configured for this selection._"
-    return "\n".join([f"- {url}" for url in feeds])
+    return feeds_markdown(feeds)
+
+
+def feeds_markdown(feeds):
+    """Feed list with each feed's recent health (latency, errors, circuit state)."""
+    health = get_feed_health().snapshot(feeds)
+    return "\n".join([format_health_line(url, health[url]) for url in feeds])
 
 def export_table_to_csv(dataframe):
     csv_buffer = io.StringIO()
@@ -45,7 +53,7 @@ def handle_export(entry_table_df):
 # ----------------------------
 # Main Summarization
 # ----------------------------
-def summarize_ui(api_key, subject_area, content_type, audience, days_limit, top_entries):
+def summarize_ui(api_key, subject_area, content_type, audience, days_limit, top_entries, max_entries=0, only_new=True):
     global session_mgr
     if not api_key:
         return (
@@ -58,10 +66,10 @@ def summarize_ui(api_key, subject_area, content_type, audience, days_limit, top_
         )
 
     llm = LLMClient(api_key=api_key)
-    session_mgr = SummaryManager(llm)
+    session_mgr = SummaryManager(llm, only_new=only_new)
 
     feeds = Config.SUBJECT_AREAS[subject_area][content_type]
-    feed_list_md = "\n".join([f"- {url}" for url in feeds]) or "_No feeds configured._"
+    feed_list_md = feeds_markdown(feeds) or "_No feeds configured._"
 
     yield (
         "",
@@ -74,35 +82,61 @@ def summarize_ui(api_key, subject_area, content_type, audience, days_limit, top_
     )
 
     progress_text = ""
+    streamed_bulk = ""
     result_obj = None
 
     # Run summarization and stream progress messages
-    for result in session_mgr.summarize(
-        subject_area=subject_area,
-        content_type=content_type,
-        audience_key=audience,
-        days_limit=days_limit,
-        top_k=top_entries,
-        summarize_top_entries=False
-    ):
-        if isinstance(result, str):
-            progress_text += result + "\n"
-            yield (
-                gr.update(),  # bulk_output
-                gr.update(choices=[], visible=False),
-                None,
-                f"### Progress Log\n{progress_text}",
-                feed_list_md,
-                gr.update(visible=True, value=result),
-                []
-            )
-        elif isinstance(result, dict):
-            result_obj = result
+    try:
+        for result in session_mgr.summarize(
+            subject_area=subject_area,
+            content_type=content_type,
+            audience_key=audience,
+            days_limit=days_limit,
+            top_k=top_entries,
+            summarize_top_entries=False,
+            max_entries=int(max_entries)
+        ):
+            if isinstance(result, str):
+                progress_text += result + "\n"
+                yield (
+                    gr.update(),  # bulk_output
+                    gr.update(choices=[], visible=False),
+                    None,
+                    f"### Progress Log\n{progress_text}",
+                    feed_list_md,
+                    gr.update(visible=True, value=result),
+                    []
+                )
+            elif isinstance(result, SummaryDelta) and result.stage == "bulk":
+                # Show the overall summary as it is written
+                streamed_bulk += result.text
+                yield (
+                    streamed_bulk,
+                    gr.update(choices=[], visible=False),
+                    None,
+                    f"### Progress Log\n{progress_text}",
+                    feed_list_md,
+                    gr.update(visible=True, value="✍️ Writing overall summary..."),
+                    []
+                )
+            elif isinstance(result, dict):
+                result_obj = result
+    except LLMError as e:
+        yield (
+            f"❌ {e}",
+            gr.update(choices=[], visible=False),
+            None,
+            f"❌ Summarization failed: {e}\n\n### Progress Log\n{progress_text}",
+            feed_list_md,
+            gr.update(visible=False),
+            []
+        )
+        return
 
     # Process results
     if result_obj:
         bulk = result_obj.get("bulk_summary") or "No new articles found."
-        cost = result_obj.get("bulk_cost", 0.0)
+        cost = result_obj.get("bulk_cost") or 0.0
         total_entries = result_obj.get("total_entries", 0)
         raw_entries = result_obj.get("raw_entries", [])
 
@@ -143,25 +177,37 @@ def summarize_ui(api_key, subject_area, content_type, audience, days_limit, top_
 def detailed_summary(raw_entries, selection, subject, audience, ctype):
     """Summarize a single selected entry."""
     if not raw_entries:
-        return "⚠️ No entries available. Run summarization first."
+        yield "⚠️ No entries available. Run summarization first."
+        return
     if not selection:
-        return "⚠️ Please select an entry."
+        yield "⚠️ Please select an entry."
+        return
 
     index = int(selection.split(".")[0]) - 1
     entry = raw_entries[index]
     if not session_mgr:
-        return "⚠️ Internal error: Session not initialized."
+        yield "⚠️ Internal error: Session not initialized."
+        return
 
-    result = session_mgr.summarize_selected(entry, subject, audience, ctype)
-    return f"""
+    header = f"""
 ### {entry['title']}
 📅 {entry.get('published', '')}
 🔗 [Link]({entry['link']})
 
 **Summary:**
-{result['summary']}
-
-💰 Cost: ${result['cost']:.4f}
+"""
+    streamed = ""
+    try:
+        for result in session_mgr.iter_summarize_selected(entry, subject, audience, ctype):
+            if isinstance(result, SummaryDelta):
+                streamed += result.text
+                yield header + streamed
+    except LLMError as e:
+        yield header + f"❌ {e}"
+        return
+    yield header + f"""{result['summary']}
+
+💰 Cost: ${result['cost']:.4f}{" (cached)" if result.get("cached") else ""}
 """
 
 # ----------------------------
@@ -202,6 +248,8 @@ with gr.Blocks(
         api_key = gr.Textbox(label="🔑 OpenAI API Key", type="password", placeholder="sk-...")
         days = gr.Slider(1, 7, value=1, step=1, label="Days Window")
         top = gr.Slider(5, 30, value=5, step=1, label="Top Entries")
+        max_entries = gr.Slider(0, 500, value=RANK_MAX_ENTRIES, step=10, label="Max Entries Summarized (0 = all, most relevant first)")
+        only_new = gr.Checkbox(value=True, label="Only entries not yet summarized for this digest")
 
     with gr.Row():
         subject = gr.Dropdown(list(Config.SUBJECT_AREAS.keys()), label="🪐 Subject Area")
@@ -246,7 +294,7 @@ with gr.Blocks(
 
     summarize_btn.click(
         fn=summarize_ui,
-        inputs=[api_key, subject, ctype, audience, days, top],
+        inputs=[api_key, subject, ctype, audience, days, top, max_entries, only_new],
         outputs=[bulk_output, top_dropdown, raw_state, status, feeds_preview, loading_box, entry_table],
         show_progress=False,
         queue=True,
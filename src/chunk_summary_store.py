@@ -0,0 +1,80 @@
+# app/chunk_summary_store.py
+import os
+import time
+import logging
+import threading
+
+from src.llm_cache import response_cache_key
+from src.sqlite_utils import connect
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS chunk_summaries (
+    chunk_key TEXT PRIMARY KEY,
+    summary TEXT NOT NULL,
+    cost REAL NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_chunk_summaries_created_at ON chunk_summaries (created_at);
+"""
+
+# Prune at most once per this many writes
+PRUNE_EVERY = 100
+
+
+def chunk_key(messages, model, temperature):
+    """Content address of a map-stage call: the messages actually sent (so prompt template or
+    audience edits miss), model and temperature - the response cache's key."""
+    return response_cache_key(model, temperature, messages)
+
+
+class ChunkSummaryStore:
+    """Map-stage summaries keyed by chunk content, shared by every session and worker.
+
+    With stable chunking, a refresh of the same window rebuilds mostly identical
+    chunks; those are answered from here and only new or changed chunks reach the
+    LLM. Summaries expire after `ttl_seconds` (by then their entries have left
+    any window worth summarizing).
+    """
+
+    def __init__(self, db_path=None, ttl_seconds=None):
+        self.db_path = db_path or os.getenv("CHUNK_SUMMARY_STORE_PATH", os.path.join("data", "chunk_summaries.db"))
+        self.ttl_seconds = ttl_seconds or float(os.getenv("CHUNK_SUMMARY_TTL_SECONDS", str(8 * 24 * 3600)))
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._conn = connect(self.db_path)
+        self._conn.executescript(SCHEMA)
+
+    def get(self, key):
+        """Stored (summary, original_cost) or None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT summary, cost FROM chunk_summaries WHERE chunk_key = ? AND created_at > ?",
+                (key, time.time() - self.ttl_seconds),
+            ).fetchone()
+        return (row["summary"], row["cost"]) if row else None
+
+    def put(self, key, summary, cost):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO chunk_summaries (chunk_key, summary, cost, created_at) VALUES (?, ?, ?, ?)",
+                (key, summary, cost, time.time()),
+            )
+            self._writes += 1
+            if self._writes % PRUNE_EVERY == 1:
+                self._conn.execute("DELETE FROM chunk_summaries WHERE created_at <= ?",
+                                   (time.time() - self.ttl_seconds,))
+
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+
+def get_chunk_summary_store():
+    """Process-wide chunk summary store, created on first use."""
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = ChunkSummaryStore()
+        return _default_store
@@ -0,0 +1,78 @@
+# app/dedupe.py
+import re
+import hashlib
+import numpy as np
+
+FINGERPRINT_BITS = 64
+# Fingerprints this many bits apart (or fewer) are treated as the same story
+MAX_DISTANCE = 6
+
+_WORD_RE = re.compile(r"\w+")
+_BIT_SHIFTS = np.arange(FINGERPRINT_BITS, dtype=np.uint64)
+
+
+def simhash(text):
+    """64-bit SimHash over lowercased words (word shingles spread short rewrites too far apart)."""
+    words = _WORD_RE.findall(text.lower())
+    if not words:
+        return 0
+    hashes = np.array(
+        [int.from_bytes(hashlib.blake2b(w.encode("utf-8"), digest_size=8).digest(), "big") for w in words],
+        dtype=np.uint64,
+    )
+    ones = ((hashes[:, None] >> _BIT_SHIFTS) & np.uint64(1)).sum(axis=0)
+    return sum(1 << bit for bit in np.flatnonzero(ones * 2 > len(words)).tolist())
+
+
+def entry_fingerprint(entry):
+    return simhash(f"{entry.get('title') or ''} {entry.get('summary') or ''}")
+
+
+class NearDuplicateIndex:
+    """Banded SimHash index: each lookup only compares against entries sharing a band.
+
+    With max_distance + 1 bands, two fingerprints within max_distance bits of each
+    other must agree on at least one whole band, so no near-duplicate is missed.
+    """
+
+    def __init__(self, max_distance=MAX_DISTANCE):
+        self.max_distance = max_distance
+        self.bands = max_distance + 1
+        self.band_bits = FINGERPRINT_BITS // self.bands
+        self._bands = {}
+        self._entries = []
+
+    def _band_keys(self, fp):
+        mask = (1 << self.band_bits) - 1
+        return [(i, (fp >> (i * self.band_bits)) & mask) for i in range(self.bands)]
+
+    def add(self, entry):
+        """Index an entry. Returns the representative it duplicates (and records the
+        entry's link on it under "alt_links"), or None if the entry is new."""
+        fp = entry_fingerprint(entry)
+        keys = self._band_keys(fp)
+        for key in keys:
+            for idx in self._bands.get(key, ()):
+                rep_fp, rep = self._entries[idx]
+                if bin(fp ^ rep_fp).count("1") <= self.max_distance:
+                    if entry.get("link") and entry["link"] != rep.get("link"):
+                        rep.setdefault("alt_links", []).append(entry["link"])
+                    return rep
+        idx = len(self._entries)
+        self._entries.append((fp, entry))
+        for key in keys:
+            self._bands.setdefault(key, []).append(idx)
+        return None
+
+
+def collapse_near_duplicates(entries, max_distance=MAX_DISTANCE):
+    """Keep the first entry of each near-duplicate cluster (input order), with the
+    others' links under "alt_links". Returns (kept, removed)."""
+    index = NearDuplicateIndex(max_distance)
+    kept, removed = [], []
+    for e in entries:
+        if index.add(e) is None:
+            kept.append(e)
+        else:
+            removed.append(e)
+    return kept, removed
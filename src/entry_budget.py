@@ -0,0 +1,98 @@
+# app/entry_budget.py
+import os
+import re
+from collections import Counter
+
+from src.token_utils import estimate_tokens
+
+# Tokens of summary text each entry may send to the LLM
+ENTRY_TOKEN_BUDGET = int(os.getenv("ENTRY_TOKEN_BUDGET", "600"))
+# A sentence in at least this share of a feed's entries is boilerplate ("Read more at ...")
+BOILERPLATE_SHARE = 0.5
+# Feeds with fewer entries than this are too small to tell boilerplate from content
+BOILERPLATE_MIN_ENTRIES = 3
+
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+
+
+def split_sentences(text):
+    return [s for s in _SENTENCE_RE.split((text or "").strip()) if s]
+
+
+def trim_to_budget(text, budget, model):
+    """Longest run of whole leading sentences within `budget` tokens. A first sentence that
+    alone is over budget is cut by words instead."""
+    if estimate_tokens(model, text) <= budget:
+        return text
+    kept, used = [], 0
+    for sentence in split_sentences(text):
+        tokens = estimate_tokens(model, sentence)
+        if used + tokens > budget:
+            break
+        kept.append(sentence)
+        used += tokens
+    if kept:
+        return " ".join(kept)
+    # ~4 characters per token
+    words = text[:budget * 4].split()
+    return " ".join(words[:-1] or words) + " …"
+
+
+class EntryBudget:
+    """Fits entries into a per-entry token allowance before chunking.
+
+    Sentences repeated across a feed's entries (sign-offs, licence lines, "appeared
+    first on" footers) are removed, then summaries still over `budget` tokens are cut
+    at a sentence boundary. The result goes in a "budgeted_summary" field that
+    entry_block() sends to the map stage; "summary" itself is left alone for display,
+    export and per-entry summaries. What was cut is remembered per link for stats().
+    """
+
+    def __init__(self, model, budget=ENTRY_TOKEN_BUDGET):
+        self.model = model
+        self.budget = budget
+        # link -> [boilerplate sentences removed, trimmed to budget, tokens saved]
+        self._cuts = {}
+
+    def _strip_boilerplate(self, entries, texts):
+        if len(entries) < BOILERPLATE_MIN_ENTRIES:
+            return texts
+        sentences = [split_sentences(text) for text in texts]
+        counts = Counter(s for per_entry in sentences for s in set(per_entry))
+        repeated = {s for s, n in counts.items() if n >= max(2, len(entries) * BOILERPLATE_SHARE)}
+        if not repeated:
+            return texts
+        stripped = []
+        for e, text, per_entry in zip(entries, texts, sentences):
+            kept = [s for s in per_entry if s not in repeated]
+            if len(kept) < len(per_entry):
+                self._cuts[e["link"]][0] = len(per_entry) - len(kept)
+                text = " ".join(kept)
+            stripped.append(text)
+        return stripped
+
+    def apply(self, entries):
+        """Budget one feed's entries (boilerplate is judged per feed). Returns the same list."""
+        originals = [e.get("summary") or "" for e in entries]
+        for e in entries:
+            self._cuts[e["link"]] = [0, False, 0]
+        texts = self._strip_boilerplate(entries, originals)
+        for e, original, text in zip(entries, originals, texts):
+            cut = self._cuts[e["link"]]
+            trimmed = trim_to_budget(text, self.budget, self.model)
+            cut[1] = trimmed != text
+            if trimmed == original:
+                e.pop("budgeted_summary", None)
+                continue
+            e["budgeted_summary"] = trimmed
+            cut[2] = max(0, estimate_tokens(self.model, original) - estimate_tokens(self.model, trimmed))
+        return entries
+
+    def stats(self, entries):
+        """What was cut from these (budgeted) entries."""
+        cuts = [self._cuts[e["link"]] for e in entries if e["link"] in self._cuts]
+        return {
+            "trimmed_entries": sum(1 for c in cuts if c[1]),
+            "boilerplate_sentences": sum(c[0] for c in cuts),
+            "tokens_saved": sum(c[2] for c in cuts),
+        }
@@ -0,0 +1,183 @@
+# app/entry_store.py
+import os
+import logging
+import threading
+from datetime import datetime
+
+from src.response_parser import normalize_url
+from src.sqlite_utils import connect, transaction
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    link_key TEXT PRIMARY KEY,
+    link TEXT,
+    title TEXT,
+    summary TEXT,
+    published TEXT NOT NULL,
+    feed_url TEXT NOT NULL,
+    subject TEXT,
+    content_type TEXT,
+    fetched_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_entries_feed_published ON entries (feed_url, published);
+CREATE INDEX IF NOT EXISTS idx_entries_subject_published ON entries (subject, content_type, published);
+CREATE INDEX IF NOT EXISTS idx_entries_published ON entries (published);
+-- Feeds (and the subject/content type they were ingested for) that list each entry;
+-- a cross-listed entry has one row per feed
+CREATE TABLE IF NOT EXISTS entry_feeds (
+    link_key TEXT NOT NULL,
+    feed_url TEXT NOT NULL,
+    subject TEXT NOT NULL DEFAULT '',
+    content_type TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (link_key, feed_url, subject, content_type)
+);
+CREATE INDEX IF NOT EXISTS idx_entry_feeds_feed ON entry_feeds (feed_url, link_key);
+CREATE INDEX IF NOT EXISTS idx_entry_feeds_subject ON entry_feeds (subject, content_type, link_key);
+CREATE TABLE IF NOT EXISTS feeds (
+    feed_url TEXT PRIMARY KEY,
+    last_fetched TEXT NOT NULL,
+    next_poll TEXT
+);
+"""
+
+
+def _row_to_entry(r):
+    return {
+        "title": r["title"],
+        "link": r["link"],
+        "published": datetime.fromisoformat(r["published"]),
+        "summary": r["summary"],
+        "feed": r["feed_url"],
+    }
+
+
+class EntryStore:
+    """SQLite store of fetched entries, keyed by normalized link. Feed and subject
+    membership is kept separately, so an entry listed by several feeds shows up in
+    each of their windows (once per query)."""
+
+    def __init__(self, db_path=None):
+        self.db_path = db_path or os.getenv("ENTRY_STORE_PATH", os.path.join("data", "entries.db"))
+        self._lock = threading.Lock()
+        self._conn = connect(self.db_path)
+        self._conn.executescript(SCHEMA)
+        if "next_poll" not in {r["name"] for r in self._conn.execute("PRAGMA table_info(feeds)")}:
+            self._conn.execute("ALTER TABLE feeds ADD COLUMN next_poll TEXT")
+        if self._conn.execute("SELECT 1 FROM entry_feeds LIMIT 1").fetchone() is None:
+            # Stores written before entry_feeds existed: each entry's last feed is its membership
+            self._conn.execute("""
+                INSERT OR IGNORE INTO entry_feeds (link_key, feed_url, subject, content_type)
+                SELECT link_key, feed_url, COALESCE(subject, ''), COALESCE(content_type, '') FROM entries
+            """)
+
+    def upsert_entries(self, entries, feed_url, subject=None, content_type=None):
+        now = datetime.utcnow().isoformat()
+        rows = [(
+            normalize_url(e["link"]), e["link"], e.get("title"), e.get("summary"),
+            e["published"].isoformat(), feed_url, subject, content_type, now,
+        ) for e in entries if e.get("link")]
+        memberships = [(r[0], feed_url, subject or "", content_type or "") for r in rows]
+        with self._lock, transaction(self._conn):
+            self._conn.executemany("""
+                INSERT INTO entries (link_key, link, title, summary, published, feed_url, subject, content_type, fetched_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(link_key) DO UPDATE SET
+                    link = excluded.link,
+                    title = excluded.title,
+                    summary = excluded.summary,
+                    published = excluded.published,
+                    feed_url = excluded.feed_url,
+                    subject = COALESCE(excluded.subject, entries.subject),
+                    content_type = COALESCE(excluded.content_type, entries.content_type),
+                    fetched_at = excluded.fetched_at
+            """, rows)
+            self._conn.executemany("""
+                INSERT OR IGNORE INTO entry_feeds (link_key, feed_url, subject, content_type) VALUES (?, ?, ?, ?)
+            """, memberships)
+        return len(rows)
+
+    def mark_fetched(self, feed_url, when=None, next_poll=None):
+        """Record a successful ingest. `next_poll` is when the background worker plans to
+        poll the feed again; fetches without one keep the plan already stored."""
+        when = when or datetime.utcnow()
+        with self._lock:
+            self._conn.execute("""
+                INSERT INTO feeds (feed_url, last_fetched, next_poll) VALUES (?, ?, ?)
+                ON CONFLICT(feed_url) DO UPDATE SET
+                    last_fetched = excluded.last_fetched,
+                    next_poll = COALESCE(excluded.next_poll, feeds.next_poll)
+            """, (feed_url, when.isoformat(), next_poll.isoformat() if next_poll else None))
+
+    def last_fetched(self, feed_urls):
+        """Map feed URL -> datetime of its last successful ingest (missing if never)."""
+        if not feed_urls:
+            return {}
+        marks = ",".join("?" * len(feed_urls))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT feed_url, last_fetched FROM feeds WHERE feed_url IN ({marks})", list(feed_urls)
+            ).fetchall()
+        return {r["feed_url"]: datetime.fromisoformat(r["last_fetched"]) for r in rows}
+
+    def next_polls(self, feed_urls):
+        """Map feed URL -> datetime of its scheduled next poll (missing if none is planned)."""
+        if not feed_urls:
+            return {}
+        marks = ",".join("?" * len(feed_urls))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT feed_url, next_poll FROM feeds WHERE feed_url IN ({marks}) AND next_poll IS NOT NULL",
+                list(feed_urls),
+            ).fetchall()
+        return {r["feed_url"]: datetime.fromisoformat(r["next_poll"]) for r in rows}
+
+    def query_window(self, feed_urls, cutoff_dt):
+        """Entries from the given feeds published after `cutoff_dt`, newest first."""
+        if not feed_urls:
+            return []
+        marks = ",".join("?" * len(feed_urls))
+        with self._lock:
+            rows = self._conn.execute(f"""
+                SELECT e.link, e.title, e.summary, e.published, MIN(m.feed_url) AS feed_url
+                FROM entries e JOIN entry_feeds m ON m.link_key = e.link_key
+                WHERE m.feed_url IN ({marks}) AND e.published > ?
+                GROUP BY e.link_key
+                ORDER BY e.published DESC
+            """, [*feed_urls, cutoff_dt.isoformat()]).fetchall()
+        return [_row_to_entry(r) for r in rows]
+
+    def get_entry(self, link):
+        """The stored entry for `link` (matched by normalized link), or None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT link, title, summary, published, feed_url FROM entries WHERE link_key = ?",
+                (normalize_url(link),),
+            ).fetchone()
+        return _row_to_entry(row) if row else None
+
+    def query_subject(self, subject, content_type, cutoff_dt):
+        """Entries ingested for a subject/content type published after `cutoff_dt`, newest first."""
+        with self._lock:
+            rows = self._conn.execute("""
+                SELECT e.link, e.title, e.summary, e.published, MIN(m.feed_url) AS feed_url
+                FROM entries e JOIN entry_feeds m ON m.link_key = e.link_key
+                WHERE m.subject = ? AND m.content_type = ? AND e.published > ?
+                GROUP BY e.link_key
+                ORDER BY e.published DESC
+            """, (subject, content_type, cutoff_dt.isoformat())).fetchall()
+        return [_row_to_entry(r) for r in rows]
+
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+
+def get_entry_store():
+    """Process-wide entry store, created on first use."""
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = EntryStore()
+        return _default_store
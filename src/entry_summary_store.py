@@ -0,0 +1,81 @@
+# app/entry_summary_store.py
+import os
+import time
+import logging
+import threading
+
+from src.response_parser import normalize_url
+from src.sqlite_utils import connect
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entry_summaries (
+    link_key TEXT NOT NULL,
+    subject TEXT NOT NULL,
+    audience TEXT NOT NULL,
+    content_type TEXT NOT NULL,
+    model TEXT NOT NULL,
+    summary TEXT NOT NULL,
+    cost REAL NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (link_key, subject, audience, content_type, model)
+);
+CREATE INDEX IF NOT EXISTS idx_entry_summaries_created_at ON entry_summaries (created_at);
+"""
+
+# Prune at most once per this many writes
+PRUNE_EVERY = 100
+
+
+class EntrySummaryStore:
+    """Single-entry summaries shared by every session and uvicorn worker.
+
+    A summary is stored per normalized link, subject, audience, content type and
+    model, so the second person asking for the same paper gets it without an LLM
+    call. Summaries expire after `ttl_seconds`.
+    """
+
+    def __init__(self, db_path=None, ttl_seconds=None):
+        self.db_path = db_path or os.getenv("ENTRY_SUMMARY_STORE_PATH", os.path.join("data", "entry_summaries.db"))
+        self.ttl_seconds = ttl_seconds or float(os.getenv("ENTRY_SUMMARY_TTL_SECONDS", str(30 * 24 * 3600)))
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._conn = connect(self.db_path)
+        self._conn.executescript(SCHEMA)
+
+    def get(self, link, subject, audience, content_type, model):
+        """Stored (summary, original_cost) or None."""
+        with self._lock:
+            row = self._conn.execute("""
+                SELECT summary, cost FROM entry_summaries
+                WHERE link_key = ? AND subject = ? AND audience = ? AND content_type = ? AND model = ?
+                  AND created_at > ?
+            """, (normalize_url(link), subject, audience, content_type, model,
+                  time.time() - self.ttl_seconds)).fetchone()
+        return (row["summary"], row["cost"]) if row else None
+
+    def put(self, link, subject, audience, content_type, model, summary, cost):
+        with self._lock:
+            self._conn.execute("""
+                INSERT OR REPLACE INTO entry_summaries
+                    (link_key, subject, audience, content_type, model, summary, cost, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, (normalize_url(link), subject, audience, content_type, model, summary, cost, time.time()))
+            self._writes += 1
+            if self._writes % PRUNE_EVERY == 1:
+                self._conn.execute("DELETE FROM entry_summaries WHERE created_at <= ?",
+                                   (time.time() - self.ttl_seconds,))
+
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+
+def get_entry_summary_store():
+    """Process-wide entry summary store, created on first use."""
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = EntrySummaryStore()
+        return _default_store
@@ -0,0 +1,87 @@
+# app/feed_cache.py
+import os
+import json
+import hashlib
+import logging
+import threading
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# Entries are kept for the widest window the UI offers, so a 1-day request
+# does not leave the cache unusable for a later 7-day request.
+DEFAULT_RETENTION_DAYS = 7
+
+
+class FeedCache:
+    """On-disk per-feed cache of HTTP validators (ETag / Last-Modified) and parsed entries."""
+
+    def __init__(self, cache_dir=None):
+        self.cache_dir = cache_dir or os.getenv("FEED_CACHE_DIR", os.path.join("data", "cache", "feeds"))
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, feed_url):
+        key = hashlib.sha1(feed_url.encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, feed_url):
+        """Return the cached record for a feed, or None if missing/unreadable."""
+        path = self._path(feed_url)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                record = json.load(f)
+            for e in record.get("entries", []):
+                e["published"] = datetime.fromisoformat(e["published"])
+            record["horizon"] = datetime.fromisoformat(record["horizon"])
+            return record
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable feed cache for {feed_url}: {e}")
+            return None
+
+    def put(self, feed_url, etag, modified, entries, horizon):
+        """Store validators and parsed entries. `horizon` is the oldest publish time kept."""
+        record = {
+            "feed_url": feed_url,
+            "etag": etag,
+            "modified": modified,
+            "horizon": horizon.isoformat(),
+            "entries": [dict(e, published=e["published"].isoformat()) for e in entries],
+        }
+        path = self._path(feed_url)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(record, f)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.warning(f"Failed to write feed cache for {feed_url}: {e}")
+
+    def record_hit(self):
+        with self._lock:
+            self.hits += 1
+
+    def record_miss(self):
+        with self._lock:
+            self.misses += 1
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses}
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_feed_cache():
+    """Process-wide feed cache, created on first use."""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = FeedCache()
+        return _default_cache
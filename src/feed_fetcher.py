@@ -0,0 +1,106 @@
+# app/feed_fetcher.py
+import os
+import time
+import asyncio
+import logging
+import threading
+from urllib.parse import urlparse
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+USER_AGENT = "PersonalNewsFeed/1.0 (+https://github.com/w-winnie/PersonalNewsFeed)"
+
+
+class FeedFetcher:
+    """Asyncio feed downloader sharing one pooled keep-alive HTTP client.
+
+    The event loop runs in a daemon thread so the pool outlives a single request and
+    sync callers (Gradio handlers, FastAPI threadpool, CLI) can submit work to it.
+    """
+
+    def __init__(self, timeout=None, per_host_limit=None, max_connections=50):
+        self.timeout = timeout or float(os.getenv("FEED_FETCH_TIMEOUT", "15"))
+        self.per_host_limit = per_host_limit or int(os.getenv("FEED_FETCH_PER_HOST", "4"))
+        self.max_connections = max_connections
+        self._client = None
+        self._host_semaphores = {}
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="feed-fetcher", daemon=True)
+        self._thread.start()
+
+    def _get_client(self):
+        # Only called from the loop thread
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.timeout),
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                ),
+                headers={"User-Agent": USER_AGENT, "Accept-Encoding": "gzip, deflate"},
+                follow_redirects=True,
+            )
+        return self._client
+
+    def _host_semaphore(self, url):
+        host = urlparse(url).netloc
+        if host not in self._host_semaphores:
+            self._host_semaphores[host] = asyncio.Semaphore(self.per_host_limit)
+        return self._host_semaphores[host]
+
+    async def fetch(self, url, etag=None, modified=None, timeout=None):
+        """Download one feed. Returns a dict with status, content, validators, elapsed and error."""
+        headers = {}
+        if etag:
+            headers["If-None-Match"] = etag
+        if modified:
+            headers["If-Modified-Since"] = modified
+
+        result = {"url": url, "status": None, "content": b"", "headers": {},
+                  "etag": None, "modified": None, "elapsed": 0.0, "error": None}
+        start = time.perf_counter()
+        try:
+            async with self._host_semaphore(url):
+                resp = await self._get_client().get(url, headers=headers, timeout=timeout or self.timeout)
+            result["status"] = resp.status_code
+            result["headers"] = {k.lower(): v for k, v in resp.headers.items()}
+            result["etag"] = resp.headers.get("etag")
+            result["modified"] = resp.headers.get("last-modified")
+            if resp.status_code == 200:
+                result["content"] = resp.content
+            elif resp.status_code != 304:
+                result["error"] = f"HTTP {resp.status_code}"
+        except Exception as e:
+            result["error"] = f"{type(e).__name__}: {e}"
+        result["elapsed"] = time.perf_counter() - start
+        return result
+
+    def submit(self, url, etag=None, modified=None, timeout=None):
+        """Schedule a fetch from any thread. Returns a concurrent.futures.Future."""
+        return asyncio.run_coroutine_threadsafe(self.fetch(url, etag, modified, timeout), self._loop)
+
+    def fetch_sync(self, url, etag=None, modified=None, timeout=None):
+        return self.submit(url, etag, modified, timeout).result()
+
+    def close(self):
+        async def _close():
+            if self._client is not None:
+                await self._client.aclose()
+                self._client = None
+        asyncio.run_coroutine_threadsafe(_close(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+
+
+_default_fetcher = None
+_default_fetcher_lock = threading.Lock()
+
+
+def get_feed_fetcher():
+    """Process-wide fetcher, created on first use."""
+    global _default_fetcher
+    with _default_fetcher_lock:
+        if _default_fetcher is None:
+            _default_fetcher = FeedFetcher()
+        return _default_fetcher
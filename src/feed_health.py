@@ -0,0 +1,126 @@
+# app/feed_health.py
+import os
+import time
+import logging
+import threading
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+# Recent fetches kept per feed for latency / error-rate figures
+WINDOW = 20
+
+
+class FeedHealth:
+    """Per-feed latency, error rate and circuit breaker state.
+
+    After `failure_threshold` consecutive failures a feed's circuit opens and
+    requests skip it. Once the cooldown passes, one background probe with a short
+    timeout is allowed; success closes the circuit, failure reopens it with a
+    doubled cooldown (capped at max_cooldown).
+    """
+
+    def __init__(self, failure_threshold=None, cooldown=None, max_cooldown=3600.0):
+        self.failure_threshold = failure_threshold or int(os.getenv("FEED_FAILURE_THRESHOLD", "3"))
+        self.cooldown = cooldown or float(os.getenv("FEED_CIRCUIT_COOLDOWN_SECONDS", "300"))
+        self.max_cooldown = max_cooldown
+        self._lock = threading.Lock()
+        self._feeds = {}
+
+    def _state(self, url):
+        if url not in self._feeds:
+            self._feeds[url] = {
+                "latencies": deque(maxlen=WINDOW),
+                "results": deque(maxlen=WINDOW),
+                "consecutive_failures": 0,
+                "last_success": None,
+                "last_error": None,
+                "open_until": None,
+                "cooldown": self.cooldown,
+                "probing": False,
+            }
+        return self._feeds[url]
+
+    def record(self, url, ok, latency, error=None):
+        with self._lock:
+            st = self._state(url)
+            st["latencies"].append(latency)
+            st["results"].append(ok)
+            st["probing"] = False
+            if ok:
+                if st["open_until"] is not None:
+                    logger.info(f"Feed {url} recovered, closing circuit")
+                st["consecutive_failures"] = 0
+                st["last_success"] = time.time()
+                st["open_until"] = None
+                st["cooldown"] = self.cooldown
+            else:
+                st["consecutive_failures"] += 1
+                st["last_error"] = error
+                if st["open_until"] is not None:
+                    # Failed probe: back off further
+                    st["cooldown"] = min(st["cooldown"] * 2, self.max_cooldown)
+                    st["open_until"] = time.time() + st["cooldown"]
+                elif st["consecutive_failures"] >= self.failure_threshold:
+                    logger.warning(f"Feed {url} failed {st['consecutive_failures']} times, opening circuit")
+                    st["open_until"] = time.time() + st["cooldown"]
+
+    def is_open(self, url):
+        with self._lock:
+            st = self._feeds.get(url)
+            return bool(st and st["open_until"] is not None)
+
+    def claim_probe(self, url):
+        """True (once) when an open feed's cooldown has passed and it should be re-tried."""
+        with self._lock:
+            st = self._feeds.get(url)
+            if not st or st["open_until"] is None or st["probing"] or time.time() < st["open_until"]:
+                return False
+            st["probing"] = True
+            return True
+
+    def snapshot(self, urls=None):
+        now = time.time()
+        with self._lock:
+            urls = list(self._feeds) if urls is None else urls
+            report = {}
+            for url in urls:
+                st = self._feeds.get(url)
+                if not st or not st["results"]:
+                    report[url] = {"state": "unknown"}
+                    continue
+                latencies = sorted(st["latencies"])
+                report[url] = {
+                    "state": "open" if st["open_until"] is not None else "closed",
+                    "error_rate": round(1 - sum(st["results"]) / len(st["results"]), 3),
+                    "median_latency_seconds": round(latencies[len(latencies) // 2], 3),
+                    "consecutive_failures": st["consecutive_failures"],
+                    "last_success_seconds_ago": round(now - st["last_success"], 1) if st["last_success"] else None,
+                    "last_error": st["last_error"],
+                    "retry_in_seconds": round(max(0.0, st["open_until"] - now), 1) if st["open_until"] else None,
+                }
+            return report
+
+
+def format_health_line(url, health):
+    """One markdown list line for the feed preview."""
+    state = health.get("state")
+    if state == "open":
+        return f"- ⛔ {url} — skipped, {health['consecutive_failures']} failures in a row ({health['last_error']})"
+    if state == "closed":
+        mark = "✅" if health["consecutive_failures"] == 0 else "⚠️"
+        return f"- {mark} {url} — {health['median_latency_seconds']:.1f}s, {health['error_rate']:.0%} errors"
+    return f"- {url}"
+
+
+_default_health = None
+_default_health_lock = threading.Lock()
+
+
+def get_feed_health():
+    """Process-wide feed health registry."""
+    global _default_health
+    with _default_health_lock:
+        if _default_health is None:
+            _default_health = FeedHealth()
+        return _default_health
@@ -0,0 +1,138 @@
+# app/feed_stream.py
+import io
+import logging
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+import xml.etree.ElementTree as ET
+
+logger = logging.getLogger(__name__)
+
+# Consecutive too-old items tolerated before a date-ordered feed is abandoned
+EARLY_STOP_AFTER = 3
+
+ITEM_TAGS = {"item", "entry"}
+
+
+class FeedStreamError(Exception):
+    """The document cannot be streamed; callers fall back to feedparser."""
+
+
+def _local(tag):
+    return tag.rsplit("}", 1)[-1] if isinstance(tag, str) else ""
+
+
+def _parse_date(text):
+    """RFC 822 (RSS pubDate) or ISO 8601 (Atom, dc:date) -> naive UTC datetime."""
+    text = (text or "").strip()
+    if not text:
+        return None
+    try:
+        dt = parsedate_to_datetime(text)
+    except (TypeError, ValueError):
+        try:
+            dt = datetime.fromisoformat(text.replace("Z", "+00:00"))
+        except ValueError:
+            return None
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt
+
+
+def _inner_markup(elem):
+    """Text of an element, or its child markup serialized back to HTML (Atom type="xhtml")."""
+    if len(elem) == 0:
+        return elem.text or ""
+    if elem.get("type") == "xhtml" and len(elem) == 1 and _local(elem[0].tag) == "div":
+        # The wrapping <div> is a container, not part of the content (RFC 4287 4.1.3)
+        elem = elem[0]
+    for node in elem.iter():
+        # Drop the XHTML namespace so the markup reads as plain HTML tags
+        node.tag = _local(node.tag)
+    return (elem.text or "") + "".join(ET.tostring(child, encoding="unicode") for child in elem)
+
+
+def _read_item(elem):
+    fields = {}
+    for child in elem:
+        name = _local(child.tag)
+        if name == "link":
+            href = child.get("href")
+            if href is not None:
+                # Atom: prefer rel="alternate" (the default rel)
+                if child.get("rel", "alternate") == "alternate" or "link" not in fields:
+                    fields["link"] = href
+            elif child.text and "link" not in fields:
+                fields["link"] = child.text.strip()
+        elif name not in fields:
+            fields[name] = _inner_markup(child)
+
+    published = None
+    for key in ("pubDate", "published", "date", "issued"):
+        if key in fields:
+            published = _parse_date(fields[key])
+            if published is None:
+                raise FeedStreamError(f"unparseable date {fields[key]!r}")
+            break
+    link = fields.get("link")
+    if not link and fields.get("guid", "").startswith("http"):
+        link = fields["guid"].strip()
+    return {
+        "title": (fields.get("title") or "").strip(),
+        "link": link,
+        "published": published,
+        # content:encoded is the full body some feeds send instead of a description
+        "summary": (fields.get("description") or fields.get("summary") or fields.get("content")
+                    or fields.get("encoded") or ""),
+    }
+
+
+def iter_feed_items(content, cutoff_dt, early_stop=True):
+    """Stream RSS/Atom items newer than `cutoff_dt` without building the whole tree.
+
+    Summaries are returned raw (HTML not cleaned) so callers only pay for cleanup on kept
+    items. Processed elements are cleared as we go, so memory stays bounded by one item.
+    If the feed is newest-first, parsing stops after EARLY_STOP_AFTER older items that
+    follow an item inside the window.
+    """
+    ordered = True
+    last_published = None
+    stale_run = 0
+    # Old items pinned above the new ones must not end the scan before it reaches them
+    found_recent = False
+    root = None
+    try:
+        for event, elem in ET.iterparse(io.BytesIO(content), events=("start", "end")):
+            if event == "start":
+                if root is None:
+                    root = elem
+                    if _local(root.tag) not in {"rss", "feed", "RDF"}:
+                        raise FeedStreamError(f"unsupported root <{_local(root.tag)}>")
+                continue
+            if _local(elem.tag) not in ITEM_TAGS:
+                continue
+
+            item = _read_item(elem)
+            elem.clear()
+            # Drop finished items from their parent too (channel for RSS, root for Atom/RDF)
+            for parent in (root, *root):
+                if len(parent) > 64:
+                    del parent[:-1]
+
+            published = item["published"]
+            if published is None:
+                continue
+            if last_published is not None and published > last_published:
+                ordered = False
+            last_published = published
+
+            if published > cutoff_dt:
+                stale_run = 0
+                found_recent = True
+                yield item
+            else:
+                stale_run += 1
+                if early_stop and ordered and found_recent and stale_run >= EARLY_STOP_AFTER:
+                    logger.debug("Feed is date-ordered, stopping at cutoff")
+                    return
+    except ET.ParseError as e:
+        raise FeedStreamError(str(e)) from e
@@ -0,0 +1,154 @@
+# app/ingestion.py
+import os
+import time
+import logging
+import argparse
+import threading
+from datetime import datetime
+
+from src.config import Config
+from src.entry_store import get_entry_store
+from src.feed_cache import DEFAULT_RETENTION_DAYS
+from src.rss_utils import iter_recent_entries
+from src.poll_scheduler import PollScheduler
+from src.logger import setup_logger
+
+logger = logging.getLogger(__name__)
+
+
+def configured_feeds():
+    """Map each configured feed URL to the first (subject, content_type) it is listed under."""
+    feeds = {}
+    for subject, by_type in Config.SUBJECT_AREAS.items():
+        for content_type, urls in by_type.items():
+            for url in urls:
+                feeds.setdefault(url, (subject, content_type))
+    return feeds
+
+
+class IngestionWorker:
+    """Background thread that keeps the entry store warm for every configured feed.
+
+    Each feed is polled when the PollScheduler says it is due; `interval` only caps
+    how long the thread sleeps between checks.
+    """
+
+    def __init__(self, interval=None, entry_store=None, scheduler=None, days_limit=DEFAULT_RETENTION_DAYS):
+        self.interval = interval or float(os.getenv("INGEST_INTERVAL_SECONDS", "600"))
+        self.entry_store = entry_store or get_entry_store()
+        self.scheduler = scheduler or PollScheduler()
+        self.days_limit = days_limit
+        self._stop = threading.Event()
+        self._thread = None
+        self.last_run = None
+        self.last_duration = None
+        self.last_stats = {}
+
+    def run_once(self, feeds=None, only_due=False):
+        """Fetch the given feeds (default: all configured) into the store.
+        With only_due, feeds the scheduler does not consider due are skipped."""
+        feeds = feeds or configured_feeds()
+        urls = self.scheduler.due(list(feeds)) if only_due else list(feeds)
+        start = time.perf_counter()
+        stats = {}
+        for url, entries, status in iter_recent_entries(urls, days_limit=self.days_limit, stats=stats):
+            subject, content_type = feeds[url]
+            self.entry_store.upsert_entries(entries, url, subject, content_type)
+            self.scheduler.observe(url, [e["published"] for e in entries], failed=status not in ("hit", "miss"))
+            if status in ("hit", "miss"):
+                # Persisted so interactive requests treat the feed as fresh until it is due
+                self.entry_store.mark_fetched(url, next_poll=self.scheduler.next_poll(url))
+        stats["polled"] = len(urls)
+        stats["skipped"] = len(feeds) - len(urls)
+        self.last_run = datetime.utcnow()
+        self.last_duration = time.perf_counter() - start
+        self.last_stats = stats
+        logger.info(f"Ingested {len(urls)} of {len(feeds)} feed(s) in {self.last_duration:.1f}s: {stats}")
+        return stats
+
+    def _loop(self):
+        while not self._stop.is_set():
+            feeds = configured_feeds()
+            try:
+                self.run_once(feeds, only_due=True)
+            except Exception as e:
+                logger.error(f"Ingestion run failed: {e}")
+            until_next = self.scheduler.seconds_until_next(list(feeds))
+            # No feeds configured: just check back every interval
+            wait = self.interval if until_next is None else min(self.interval, until_next)
+            self._stop.wait(max(wait, 1.0))
+
+    def start(self):
+        if self.is_running():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="feed-ingestion", daemon=True)
+        self._thread.start()
+        logger.info("Background ingestion started")
+
+    def stop(self, timeout=10):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+        logger.info("Background ingestion stopped")
+
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def status(self):
+        """Worker state plus per-feed age of the last successful ingest."""
+        feeds = configured_feeds()
+        now = datetime.utcnow()
+        fetched = self.entry_store.last_fetched(list(feeds))
+        return {
+            "running": self.is_running(),
+            "interval_seconds": self.interval,
+            "last_run": self.last_run.isoformat() if self.last_run else None,
+            "last_duration_seconds": self.last_duration,
+            "last_stats": self.last_stats,
+            "schedule": self.scheduler.snapshot(),
+            "feeds": {
+                url: {
+                    "last_fetched": fetched[url].isoformat() if url in fetched else None,
+                    "age_seconds": (now - fetched[url]).total_seconds() if url in fetched else None,
+                }
+                for url in feeds
+            },
+        }
+
+
+_default_worker = None
+_default_worker_lock = threading.Lock()
+
+
+def get_ingestion_worker():
+    """Process-wide ingestion worker (not started until start() is called)."""
+    global _default_worker
+    with _default_worker_lock:
+        if _default_worker is None:
+            _default_worker = IngestionWorker()
+        return _default_worker
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Keep the local entry store fresh for all configured feeds.")
+    parser.add_argument("--interval", type=float, default=None, help="Max seconds between schedule checks (default INGEST_INTERVAL_SECONDS or 600)")
+    parser.add_argument("--once", action="store_true", help="Run a single ingestion pass and exit")
+    args = parser.parse_args()
+
+    setup_logger("src", log_to_file=True)
+    worker = IngestionWorker(interval=args.interval)
+    if args.once:
+        worker.run_once()
+        return
+    worker.start()
+    try:
+        while worker.is_running():
+            time.sleep(1)
+    except KeyboardInterrupt:
+        worker.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+# app/llm_cache.py
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+from src.sqlite_utils import connect
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    content TEXT NOT NULL,
+    cost REAL NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    used_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_responses_used_at ON responses (used_at);
+"""
+
+# Prune the disk tier at most once per this many writes
+PRUNE_EVERY = 50
+
+
+def response_cache_key(model, temperature, messages):
+    """Content address of a chat request: model, temperature and a hash of the messages."""
+    payload = json.dumps(messages, sort_keys=True, ensure_ascii=False)
+    digest = hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    return f"{model}:{temperature}:{digest}"
+
+
+class ResponseCache:
+    """Two-tier LLM response cache: in-memory LRU in front of a SQLite file.
+
+    Both tiers expire entries after `ttl_seconds`. The memory tier holds at most
+    `max_items` responses; the disk tier is trimmed (least recently used first) to
+    `max_bytes` of response text.
+    """
+
+    def __init__(self, db_path=None, ttl_seconds=None, max_items=None, max_bytes=None):
+        self.db_path = db_path or os.getenv("LLM_CACHE_PATH", os.path.join("data", "llm_cache.db"))
+        self.ttl_seconds = ttl_seconds or float(os.getenv("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+        self.max_items = max_items or int(os.getenv("LLM_CACHE_MEMORY_ITEMS", "512"))
+        self.max_bytes = max_bytes or int(os.getenv("LLM_CACHE_MAX_BYTES", str(200 * 1024 * 1024)))
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()
+        self._writes = 0
+        self._conn = connect(self.db_path)
+        self._conn.executescript(SCHEMA)
+        self.hits = 0
+        self.misses = 0
+        self.saved_cost = 0.0
+
+    def get(self, key):
+        """Cached (content, original_cost) or None."""
+        now = time.time()
+        with self._lock:
+            item = self._memory.get(key)
+            if item and now - item[2] <= self.ttl_seconds:
+                self._memory.move_to_end(key)
+                return self._hit(item[0], item[1])
+            self._memory.pop(key, None)
+
+            row = self._conn.execute(
+                "SELECT content, cost, created_at FROM responses WHERE key = ? AND created_at > ?",
+                (key, now - self.ttl_seconds),
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE responses SET used_at = ? WHERE key = ?", (now, key))
+            self._remember(key, row["content"], row["cost"], row["created_at"])
+            return self._hit(row["content"], row["cost"])
+
+    def _hit(self, content, cost):
+        self.hits += 1
+        self.saved_cost += cost
+        return content, cost
+
+    def _remember(self, key, content, cost, created_at):
+        self._memory[key] = (content, cost, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_items:
+            self._memory.popitem(last=False)
+
+    def put(self, key, model, content, cost):
+        now = time.time()
+        with self._lock:
+            self._remember(key, content, cost, now)
+            self._conn.execute("""
+                INSERT OR REPLACE INTO responses (key, model, content, cost, size, created_at, used_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, (key, model, content, cost, len(content.encode("utf-8")), now, now))
+            self._writes += 1
+            if self._writes % PRUNE_EVERY == 1:
+                self._prune(now)
+
+    def _prune(self, now):
+        self._conn.execute("DELETE FROM responses WHERE created_at <= ?", (now - self.ttl_seconds,))
+        (total,) = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()
+        if total <= self.max_bytes:
+            return
+        # Drop least recently used rows until under the byte limit
+        excess = total - self.max_bytes
+        rows = self._conn.execute("SELECT key, size FROM responses ORDER BY used_at ASC").fetchall()
+        doomed = []
+        for r in rows:
+            if excess <= 0:
+                break
+            doomed.append((r["key"],))
+            excess -= r["size"]
+        self._conn.executemany("DELETE FROM responses WHERE key = ?", doomed)
+        logger.info(f"Pruned {len(doomed)} cached LLM responses to stay under {self.max_bytes} bytes")
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "saved_cost": round(self.saved_cost, 6)}
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_response_cache():
+    """Process-wide response cache, or None when disabled with LLM_CACHE=0."""
+    global _default_cache
+    if os.getenv("LLM_CACHE", "1") == "0":
+        return None
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = ResponseCache()
+        return _default_cache
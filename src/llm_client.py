@@ -1,40 +1,238 @@
 import os
-from openai import OpenAI
+import time
+import asyncio
+import hashlib
+import threading
+from collections import OrderedDict
+from openai import OpenAI, AsyncOpenAI, APIConnectionError, InternalServerError, RateLimitError
 import logging
 from src.token_utils import estimate_openai_cost
+from src.llm_cache import get_response_cache, response_cache_key
+from src.llm_scheduler import get_llm_scheduler, retry_after_seconds, PRIORITY_BULK
 
 logger = logging.getLogger(__name__)
 
+# Failures worth retrying after a backoff; anything else (auth, bad request) fails at once
+RETRYABLE_ERRORS = (RateLimitError, APIConnectionError, InternalServerError)
+
+class LLMError(Exception):
+    """An LLM call failed (after retries). Raised instead of returning error text."""
+
+class _ClientRegistry:
+    """Pooled OpenAI clients shared across requests, one per API key (stored by hash).
+
+    Reusing a client reuses its HTTP connection pool, so repeat calls skip the TCP/TLS
+    handshake. Sync and async clients are pooled separately, each capped at `max_size`;
+    least recently used clients beyond that, and clients idle for `idle_seconds`, are
+    closed. Async clients are tied to the event loop that opened them and are dropped
+    once that loop is closed.
+    """
+
+    def __init__(self, max_size=None, idle_seconds=None):
+        self.max_size = max_size or int(os.getenv("LLM_CLIENT_POOL_SIZE", "32"))
+        self.idle_seconds = idle_seconds or float(os.getenv("LLM_CLIENT_IDLE_SECONDS", "600"))
+        self._lock = threading.Lock()
+        # key hash -> (client, last used)
+        self._clients = OrderedDict()
+        # (key hash, id(loop)) -> (client, loop, last used)
+        self._async_clients = OrderedDict()
+
+    @staticmethod
+    def _close_async(client, loop):
+        # AsyncOpenAI.close() must run on the client's own loop; a closed loop already
+        # took its connections down with it
+        if loop.is_running():
+            asyncio.run_coroutine_threadsafe(client.close(), loop)
+
+    def _evict(self, now):
+        for key in [k for k, (_, used) in self._clients.items() if now - used > self.idle_seconds]:
+            client, _ = self._clients.pop(key)
+            client.close()
+
+        for key in [k for k, (_, loop, used) in self._async_clients.items()
+                    if loop.is_closed() or now - used > self.idle_seconds]:
+            client, loop, _ = self._async_clients.pop(key)
+            self._close_async(client, loop)
+
+    def _trim(self):
+        while len(self._clients) > self.max_size:
+            _, (client, _) = self._clients.popitem(last=False)
+            client.close()
+        while len(self._async_clients) > self.max_size:
+            _, (client, loop, _) = self._async_clients.popitem(last=False)
+            self._close_async(client, loop)
+
+    def get(self, api_key, use_async=False):
+        key_hash = hashlib.sha256(api_key.encode("utf-8")).hexdigest()
+        now = time.monotonic()
+        with self._lock:
+            self._evict(now)
+            # Retries are left to the scheduler, which frees the slot while backing off
+            if use_async:
+                # Async connections belong to the event loop that opened them
+                loop = asyncio.get_running_loop()
+                key = (key_hash, id(loop))
+                if key in self._async_clients:
+                    client, _, _ = self._async_clients.pop(key)
+                else:
+                    client = AsyncOpenAI(api_key=api_key, max_retries=0)
+                self._async_clients[key] = (client, loop, now)
+            else:
+                if key_hash in self._clients:
+                    client, _ = self._clients.pop(key_hash)
+                else:
+                    client = OpenAI(api_key=api_key, max_retries=0)
+                self._clients[key_hash] = (client, now)
+            self._trim()
+            return client
+
+_registry = _ClientRegistry()
+
 class LLMClient:
-    def __init__(self, api_key=None, model="gpt-4o-mini", temperature=0.5):
+    def __init__(self, api_key=None, model="gpt-4o-mini", temperature=0.5, use_cache=True):
         self.api_key = api_key or os.getenv("OPENAI_API_KEY")
         if not self.api_key:
             raise ValueError("No OpenAI API key provided")
-        self.client = OpenAI(api_key=self.api_key)
         self.model = model
         self.temperature = temperature
+        self.cache = get_response_cache() if use_cache else None
+        # Calls made through this client; cached responses cost 0 and count as saved
+        self._usage_lock = threading.Lock()
+        self.usage = {"calls": 0, "cache_hits": 0, "saved_cost": 0.0, "queue_wait": 0.0}
+        self.scheduler = get_llm_scheduler()
 
-    def chat(self, messages, return_cost_info=False):
-        try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=messages,
-                temperature=self.temperature
-            )
-            choice = response.choices[0]
-            content = choice.message.content
+    def _count(self, cached_cost=None):
+        with self._usage_lock:
+            self.usage["calls"] += 1
+            if cached_cost is not None:
+                self.usage["cache_hits"] += 1
+                self.usage["saved_cost"] += cached_cost
 
-            usage = response.usage
-            tokens_prompt = usage.prompt_tokens
-            tokens_completion = usage.completion_tokens
+    def _cached(self, messages, model, temperature):
+        """(content, original_cost) for a cache hit, else None. Returns the cache key too."""
+        if self.cache is None:
+            return None, None
+        key = response_cache_key(model, temperature, messages)
+        hit = self.cache.get(key)
+        if hit is not None:
+            self._count(cached_cost=hit[1])
+        return hit, key
 
-            cost_info = estimate_openai_cost(self.model, tokens_prompt, tokens_completion)
+    @property
+    def client(self):
+        return _registry.get(self.api_key)
 
-            if return_cost_info:
-                return content, cost_info
+    def _finish(self, content, model, tokens_prompt, tokens_completion, return_cost_info, cache_key=None):
+        cost_info = estimate_openai_cost(model, tokens_prompt, tokens_completion)
+        self._count()
+        if cache_key and content:
+            self.cache.put(cache_key, model, content, cost_info)
 
-            return content
+        if return_cost_info:
+            return content, cost_info
 
+        return content
+
+    def _read_response(self, response, model, return_cost_info, cache_key=None):
+        choice = response.choices[0]
+        content = choice.message.content
+
+        usage = response.usage
+        return self._finish(content, model, usage.prompt_tokens, usage.completion_tokens, return_cost_info, cache_key)
+
+    def _read_stream(self, stream, model, return_cost_info, on_delta, cache_key=None):
+        parts, usage = [], None
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                parts.append(chunk.choices[0].delta.content)
+                on_delta(parts[-1])
+            # With include_usage the last chunk has no choices, only usage
+            if chunk.usage:
+                usage = chunk.usage
+        content = "".join(parts)
+        if usage is None:
+            return self._finish(content, model, 0, 0, return_cost_info)
+        return self._finish(content, model, usage.prompt_tokens, usage.completion_tokens, return_cost_info, cache_key)
+
+    def _request(self, messages, on_delta, model, temperature):
+        kwargs = {}
+        if on_delta is not None:
+            kwargs = {"stream": True, "stream_options": {"include_usage": True}}
+        return dict(model=model, messages=messages, temperature=temperature, **kwargs)
+
+    def _waited(self, seconds):
+        with self._usage_lock:
+            self.usage["queue_wait"] += seconds
+
+    def _send(self, messages, on_delta, priority, model, temperature):
+        """One API call through the shared scheduler, retried with backoff on 429s and
+        transient failures. Returns holding the scheduler slot (the response may still be
+        streaming); the caller releases it once the response has been read."""
+        for attempt in range(self.scheduler.max_retries + 1):
+            self._waited(self.scheduler.acquire(self.api_key, priority))
+            try:
+                return self.client.chat.completions.create(**self._request(messages, on_delta, model, temperature))
+            except RETRYABLE_ERRORS as e:
+                self.scheduler.release(self.api_key)
+                if attempt == self.scheduler.max_retries:
+                    logger.error(f"OpenAI API error after {attempt + 1} attempts: {e}")
+                    raise LLMError(f"OpenAI API error after {attempt + 1} attempts: {e}") from e
+                self.scheduler.backoff(self.api_key, retry_after_seconds(e, attempt))
+            except Exception as e:
+                self.scheduler.release(self.api_key)
+                logger.error(f"OpenAI API error: {e}")
+                raise LLMError(f"OpenAI API error: {e}") from e
+
+    def _settings(self, model, temperature):
+        """The client's model/temperature unless overridden for this call."""
+        return model or self.model, self.temperature if temperature is None else temperature
+
+    def chat(self, messages, return_cost_info=False, on_delta=None, priority=PRIORITY_BULK, model=None,
+             temperature=None):
+        """Chat completion. With `on_delta`, the completion is streamed and on_delta(text) is
+        called per piece as it arrives; the return value is the same either way. `model` and
+        `temperature` override the client's for this call (cost and caching follow them).
+        Raises LLMError when the call fails."""
+        model, temperature = self._settings(model, temperature)
+        hit, cache_key = self._cached(messages, model, temperature)
+        if hit is not None:
+            if on_delta is not None:
+                on_delta(hit[0])
+            return (hit[0], 0.0) if return_cost_info else hit[0]
+
+        response = self._send(messages, on_delta, priority, model, temperature)
+        try:
+            if on_delta is not None:
+                return self._read_stream(response, model, return_cost_info, on_delta, cache_key)
+            return self._read_response(response, model, return_cost_info, cache_key)
         except Exception as e:
+            # e.g. the connection dropped mid-stream
             logger.error(f"OpenAI API error: {e}")
-            return "Error: " + str(e)
+            raise LLMError(f"OpenAI API error: {e}") from e
+        finally:
+            # A streamed completion counts against LLM_MAX_CONCURRENT until it is fully read
+            self.scheduler.release(self.api_key)
+
+    async def achat(self, messages, return_cost_info=False, priority=PRIORITY_BULK, model=None, temperature=None):
+        """Async counterpart of chat() with the same return values, cost accounting and errors."""
+        model, temperature = self._settings(model, temperature)
+        hit, cache_key = self._cached(messages, model, temperature)
+        if hit is not None:
+            return (hit[0], 0.0) if return_cost_info else hit[0]
+
+        client = _registry.get(self.api_key, use_async=True)
+        for attempt in range(self.scheduler.max_retries + 1):
+            self._waited(await asyncio.to_thread(self.scheduler.acquire, self.api_key, priority))
+            try:
+                response = await client.chat.completions.create(**self._request(messages, None, model, temperature))
+                return self._read_response(response, model, return_cost_info, cache_key)
+            except RETRYABLE_ERRORS as e:
+                if attempt == self.scheduler.max_retries:
+                    logger.error(f"OpenAI API error after {attempt + 1} attempts: {e}")
+                    raise LLMError(f"OpenAI API error after {attempt + 1} attempts: {e}") from e
+                self.scheduler.backoff(self.api_key, retry_after_seconds(e, attempt))
+            except Exception as e:
+                logger.error(f"OpenAI API error: {e}")
+                raise LLMError(f"OpenAI API error: {e}") from e
+            finally:
+                self.scheduler.release(self.api_key)
@@ -0,0 +1,146 @@
+# app/llm_scheduler.py
+import os
+import time
+import random
+import hashlib
+import logging
+import threading
+from collections import deque
+from email.utils import parsedate_to_datetime
+
+logger = logging.getLogger(__name__)
+
+# Lower runs first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BULK = 1
+PRIORITY_NAMES = {PRIORITY_INTERACTIVE: "interactive", PRIORITY_BULK: "bulk"}
+
+# Recent queue waits kept per priority for the percentiles in snapshot()
+WINDOW = 200
+
+
+def key_id(api_key):
+    """Calls are grouped per API key; only its hash is kept."""
+    return hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()[:16]
+
+
+def retry_after_seconds(error, attempt, base=1.0, cap=60.0):
+    """Delay before retrying a rate-limited call: the provider's Retry-After header when
+    it sent one, else exponential backoff with jitter."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        if headers.get("retry-after-ms"):
+            return min(float(headers["retry-after-ms"]) / 1000, cap)
+        if headers.get("retry-after"):
+            value = headers["retry-after"]
+            try:
+                return min(float(value), cap)
+            except ValueError:
+                return min(max(0.0, parsedate_to_datetime(value).timestamp() - time.time()), cap)
+    except (TypeError, ValueError):
+        pass
+    return min(base * 2 ** attempt, cap) * random.uniform(0.5, 1.0)
+
+
+class LLMScheduler:
+    """Process-wide gate in front of the LLM provider.
+
+    At most `max_concurrent` calls run at once. When a slot frees up, the waiting
+    call with the best priority goes next; within a priority, the API key with the
+    fewest calls in flight wins (fair share), then the oldest call. After a 429 the
+    key is held back for the provider's Retry-After while other keys keep going.
+    """
+
+    def __init__(self, max_concurrent=None, max_retries=None):
+        self.max_concurrent = max_concurrent or int(os.getenv("LLM_MAX_CONCURRENT", "8"))
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv("LLM_MAX_RETRIES", "4"))
+        self._cond = threading.Condition()
+        self._running = 0
+        self._seq = 0
+        self._waiting = {}
+        self._in_flight = {}
+        self._blocked_until = {}
+        self._waits = {p: deque(maxlen=WINDOW) for p in PRIORITY_NAMES}
+        self._retries = 0
+
+    def _next_ticket(self, now):
+        eligible = [(priority, self._in_flight.get(key, 0), seq)
+                    for seq, (key, priority) in self._waiting.items()
+                    if self._blocked_until.get(key, 0) <= now]
+        return min(eligible)[2] if eligible else None
+
+    def acquire(self, api_key, priority=PRIORITY_BULK):
+        """Block until this call may run. Returns seconds spent queued."""
+        key = key_id(api_key)
+        start = time.monotonic()
+        with self._cond:
+            self._seq += 1
+            seq = self._seq
+            self._waiting[seq] = (key, priority)
+            while True:
+                now = time.monotonic()
+                if self._running < self.max_concurrent and self._next_ticket(now) == seq:
+                    break
+                blocked = [t for t in self._blocked_until.values() if t > now]
+                self._cond.wait(max(0.01, min(blocked) - now) if blocked else None)
+            del self._waiting[seq]
+            self._running += 1
+            self._in_flight[key] = self._in_flight.get(key, 0) + 1
+            waited = time.monotonic() - start
+            self._waits.setdefault(priority, deque(maxlen=WINDOW)).append(waited)
+            # Another waiter may be eligible too (e.g. several slots freed at once)
+            self._cond.notify_all()
+        return waited
+
+    def release(self, api_key):
+        key = key_id(api_key)
+        with self._cond:
+            self._running -= 1
+            self._in_flight[key] -= 1
+            if not self._in_flight[key]:
+                del self._in_flight[key]
+            self._cond.notify_all()
+
+    def backoff(self, api_key, seconds):
+        """Hold back every call for this key for `seconds` (after a 429)."""
+        key = key_id(api_key)
+        with self._cond:
+            self._retries += 1
+            now = time.monotonic()
+            for k in [k for k, t in self._blocked_until.items() if t <= now]:
+                del self._blocked_until[k]
+            self._blocked_until[key] = max(self._blocked_until.get(key, 0), now + seconds)
+            self._cond.notify_all()
+        logger.warning(f"LLM rate limited, backing off {seconds:.1f}s")
+
+    def snapshot(self):
+        with self._cond:
+            now = time.monotonic()
+            report = {
+                "running": self._running,
+                "max_concurrent": self.max_concurrent,
+                "queued": {name: sum(1 for _, p in self._waiting.values() if p == priority)
+                           for priority, name in PRIORITY_NAMES.items()},
+                "keys_backing_off": sum(1 for t in self._blocked_until.values() if t > now),
+                "retries": self._retries,
+            }
+            for priority, name in PRIORITY_NAMES.items():
+                waits = sorted(self._waits[priority])
+                if waits:
+                    report[f"{name}_wait_p50_seconds"] = round(waits[len(waits) // 2], 3)
+                    report[f"{name}_wait_p95_seconds"] = round(waits[int(len(waits) * 0.95)], 3)
+            return report
+
+
+_default_scheduler = None
+_default_scheduler_lock = threading.Lock()
+
+
+def get_llm_scheduler():
+    """Process-wide LLM scheduler, created on first use."""
+    global _default_scheduler
+    with _default_scheduler_lock:
+        if _default_scheduler is None:
+            _default_scheduler = LLMScheduler()
+        return _default_scheduler
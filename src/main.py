@@ -1,15 +1,130 @@
 # app/main.py
 
+import os
+import json
+import time
 import argparse
+from datetime import datetime
+from itertools import product
+from concurrent.futures import ThreadPoolExecutor
 
 from src.llm_client import LLMClient
 from src.summary_manager import SummaryManager
+from src.ingestion import IngestionWorker, configured_feeds
 from src.config import Config
 from src.logger import setup_logger  
 from src.response_parser import export_entries_to_csv  
 
 logger = setup_logger(log_to_file=True)  
 
+# Combinations summarized at once in --matrix mode
+MATRIX_CONCURRENCY = int(os.getenv("MATRIX_CONCURRENCY", "3"))
+
+def _pick(value, choices):
+    """Comma-separated subset of `choices`, or all of them when value is empty."""
+    if not value:
+        return list(choices)
+    picked = [v.strip() for v in value.split(",") if v.strip()]
+    unknown = [v for v in picked if v not in choices]
+    if unknown:
+        raise SystemExit(f"Unknown value(s) {unknown}; choose from {list(choices)}")
+    return picked
+
+def _digest_name(subject, content_type, audience):
+    return f"{subject}__{content_type}__{audience}.json"
+
+def run_combination(llm, subject, content_type, audience, days, top):
+    """Summarize one (subject, content_type, audience) from the entry store. Returns its digest dict."""
+    start = time.perf_counter()
+    digest = {"subject": subject, "content_type": content_type, "audience": audience, "days": days}
+    try:
+        # Every combination sees the whole window, not just what an earlier one left unseen
+        manager = SummaryManager(llm, only_new=False)
+        result = manager.summarize1(
+            subject_area=subject,
+            content_type=content_type,
+            audience_key=audience,
+            days_limit=days,
+            top_k=top,
+            summarize_top_entries=True,
+            refresh=False,
+        )
+        digest.update({
+            "status": "ok",
+            "bulk_summary": result.get("bulk_summary"),
+            "total_entries": result.get("total_entries", 0),
+            "summarized_entries": result.get("summarized_entries", 0),
+            "top_entries": [{
+                "title": item["entry"].get("title", ""),
+                "published": str(item["entry"].get("published", "")),
+                "link": item["entry"].get("link", ""),
+                "summary": item["summary"],
+                "cost": item["cost"],
+            } for item in result.get("top_entries", [])],
+            "cost": result.get("bulk_cost") or 0.0,
+            "stage_stats": result.get("stage_stats", {}),
+        })
+    except Exception as e:
+        logger.error(f"Digest {subject}/{content_type}/{audience} failed: {e}")
+        digest.update({"status": "error", "error": str(e), "cost": 0.0})
+    digest["seconds"] = round(time.perf_counter() - start, 2)
+    return digest
+
+def run_matrix(args):
+    """Summarize every selected (subject, content_type, audience) combination in one process.
+    Feeds are ingested once up front; combinations then read from the entry store in parallel
+    and each writes a JSON digest, plus an index.json with timing and cost per combination."""
+    subjects = _pick(args.subjects, Config.SUBJECT_AREAS.keys())
+    content_types = _pick(args.content_types, Config.CONTENT_TYPES)
+    audiences = _pick(args.audiences, Config.AUDIENCES.keys())
+    combos = list(product(subjects, content_types, audiences))
+    out_dir = args.out or os.path.join("data", "digests", datetime.utcnow().strftime("%Y%m%dT%H%M%SZ"))
+    os.makedirs(out_dir, exist_ok=True)
+
+    # One fetch per feed, however many combinations list it
+    all_feeds = configured_feeds()
+    feeds = {url: all_feeds[url] for s, c in product(subjects, content_types)
+             for url in Config.SUBJECT_AREAS[s].get(c, [])}
+    fetch_start = time.perf_counter()
+    fetch_stats = IngestionWorker(days_limit=args.days).run_once(feeds) if feeds else {}
+    fetch_seconds = time.perf_counter() - fetch_start
+    logger.info(f"Fetched {len(feeds)} feed(s) in {fetch_seconds:.1f}s; summarizing {len(combos)} combination(s)")
+
+    llm = LLMClient(api_key=args.api_key)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        digests = list(pool.map(
+            lambda combo: run_combination(llm, *combo, days=args.days, top=args.top), combos
+        ))
+
+    for digest in digests:
+        with open(os.path.join(out_dir, _digest_name(digest["subject"], digest["content_type"], digest["audience"])), "w", encoding="utf-8") as f:
+            json.dump(digest, f, indent=2, ensure_ascii=False)
+
+    index = {
+        "generated_at": datetime.utcnow().isoformat() + "Z",
+        "days": args.days,
+        "feeds": len(feeds),
+        "fetch_seconds": round(fetch_seconds, 2),
+        "fetch_stats": {k: v for k, v in fetch_stats.items() if not isinstance(v, list)},
+        "summarize_seconds": round(time.perf_counter() - start, 2),
+        "total_cost": round(sum(d["cost"] for d in digests), 6),
+        "combinations": [{
+            "subject": d["subject"],
+            "content_type": d["content_type"],
+            "audience": d["audience"],
+            "file": _digest_name(d["subject"], d["content_type"], d["audience"]),
+            "status": d["status"],
+            "seconds": d["seconds"],
+            "cost": d["cost"],
+            "total_entries": d.get("total_entries", 0),
+        } for d in digests],
+    }
+    with open(os.path.join(out_dir, "index.json"), "w", encoding="utf-8") as f:
+        json.dump(index, f, indent=2)
+    failed = sum(1 for d in digests if d["status"] != "ok")
+    logger.info(f"Wrote {len(digests)} digest(s) to {out_dir} ({failed} failed), total cost ${index['total_cost']:.4f}")
+
 def main():
     parser = argparse.ArgumentParser(description="Generate summaries from scientific RSS feeds.")
     parser.add_argument("--subject", choices=Config.SUBJECT_AREAS.keys(), default="astro", help="Subject area (astro, ai)")
@@ -18,9 +133,19 @@ def main():
     parser.add_argument("--days", type=int, default=1, help="How many days back to fetch entries")
     parser.add_argument("--top", type=int, default=5, help="How many top entries to show")
     parser.add_argument("--api_key", type=str, required=False, help="OpenAI API Key (or set OPENAI_API_KEY env)")
+    parser.add_argument("--matrix", action="store_true", help="Summarize every subject/content type/audience combination into a digest directory")
+    parser.add_argument("--subjects", type=str, help="--matrix: comma-separated subjects (default all)")
+    parser.add_argument("--content_types", type=str, help="--matrix: comma-separated content types (default all)")
+    parser.add_argument("--audiences", type=str, help="--matrix: comma-separated audiences (default all)")
+    parser.add_argument("--concurrency", type=int, default=MATRIX_CONCURRENCY, help="--matrix: combinations summarized at once")
+    parser.add_argument("--out", type=str, help="--matrix: digest directory (default data/digests/<UTC timestamp>)")
 
     args = parser.parse_args()
 
+    if args.matrix:
+        run_matrix(args)
+        return
+
     logger.info(f"\n Generating summary for subject: {args.subject}, content type: {args.content_type}, audience: {args.audience}")
 
     llm = LLMClient(api_key=args.api_key)
@@ -49,6 +174,8 @@ def main():
     logger.info(f"\n📁 All entries exported to: {csv_path}")
     
     logger.info(f"Estimated cost for overall analysis: ${cost:.4f}")
+    for stage, stats in result.get("stage_stats", {}).items():
+        logger.info(f"  {stage} ({stats['model']}): {stats['calls']} call(s), ${stats['cost']:.4f}, {stats['seconds']:.1f}s")
     logger.info("\nOVERALL SUMMARY:\n")
     logger.info(bulk)
 
@@ -0,0 +1,110 @@
+# app/poll_scheduler.py
+import os
+import random
+import logging
+import statistics
+import threading
+from datetime import datetime, timedelta
+
+logger = logging.getLogger(__name__)
+
+# Items published this close together count as one feed update (arXiv posts a day's batch at once)
+BATCH_WINDOW = timedelta(minutes=5)
+# Newest update gaps used to estimate a feed's cadence
+CADENCE_SAMPLES = 20
+# Interval growth after a poll that found nothing new
+NO_CHANGE_BACKOFF = 1.5
+
+
+def update_gaps(published_times):
+    """Seconds between successive feed updates, newest first, with batches collapsed."""
+    times = sorted(set(published_times), reverse=True)
+    updates = []
+    for t in times:
+        if not updates or updates[-1] - t > BATCH_WINDOW:
+            updates.append(t)
+    return [(a - b).total_seconds() for a, b in zip(updates, updates[1:])][:CADENCE_SAMPLES]
+
+
+class PollScheduler:
+    """Per-feed poll times learned from observed update cadence.
+
+    A feed is polled at about half its median gap between updates, clamped to
+    [min_interval, staleness_target]. Polls that find nothing new back the
+    interval off towards staleness_target, so no feed goes unpolled for longer.
+    """
+
+    def __init__(self, min_interval=None, staleness_target=None, jitter=0.1):
+        self.min_interval = min_interval or float(os.getenv("POLL_MIN_SECONDS", "300"))
+        self.staleness_target = staleness_target or float(os.getenv("POLL_STALENESS_TARGET_SECONDS", "21600"))
+        self.jitter = jitter
+        self._lock = threading.Lock()
+        self._feeds = {}
+
+    def _clamp(self, seconds):
+        return max(self.min_interval, min(self.staleness_target, seconds))
+
+    def observe(self, feed_url, published_times, failed=False, now=None):
+        """Record a poll result and schedule the feed's next poll. Returns the interval used.
+        The poll counts as a change when it shows an item newer than any seen before."""
+        now = now or datetime.utcnow()
+        with self._lock:
+            state = self._feeds.setdefault(feed_url, {"interval": self.min_interval, "cadence": None,
+                                                      "newest": None, "polls": 0, "changes": 0})
+            newest = max(published_times, default=None)
+            changed = not failed and newest is not None and (state["newest"] is None or newest > state["newest"])
+            if changed:
+                state["newest"] = newest
+            gaps = update_gaps(published_times)
+            if gaps:
+                state["cadence"] = statistics.median(gaps)
+            if changed or state["polls"] == 0:
+                base = state["cadence"] / 2 if state["cadence"] else self.min_interval
+            else:
+                base = state["interval"] * NO_CHANGE_BACKOFF
+            interval = self._clamp(base)
+            state["interval"] = interval
+            state["polls"] += 1
+            state["changes"] += 1 if changed else 0
+            state["last_poll"] = now
+            state["next_poll"] = now + timedelta(seconds=interval * random.uniform(1 - self.jitter, 1 + self.jitter))
+            return interval
+
+    def due(self, feed_urls, now=None):
+        """Feeds whose next poll time has passed (never-seen feeds are always due)."""
+        now = now or datetime.utcnow()
+        with self._lock:
+            return [url for url in feed_urls
+                    if url not in self._feeds or self._feeds[url]["next_poll"] <= now]
+
+    def next_poll(self, feed_url):
+        """Scheduled next poll of a feed, or None before its first observe()."""
+        with self._lock:
+            state = self._feeds.get(feed_url)
+            return state["next_poll"] if state else None
+
+    def seconds_until_next(self, feed_urls, now=None):
+        """Seconds until the first of these feeds is due (0 if one was never polled), or
+        None when there are no feeds to wait for."""
+        if not feed_urls:
+            return None
+        now = now or datetime.utcnow()
+        with self._lock:
+            pending = [self._feeds[url]["next_poll"] for url in feed_urls if url in self._feeds]
+            if len(pending) < len(feed_urls):
+                return 0.0
+        return max(0.0, (min(pending) - now).total_seconds()) if pending else 0.0
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                url: {
+                    "interval_seconds": state["interval"],
+                    "cadence_seconds": state["cadence"],
+                    "polls": state["polls"],
+                    "changes": state["changes"],
+                    "last_poll": state["last_poll"].isoformat(),
+                    "next_poll": state["next_poll"].isoformat(),
+                }
+                for url, state in self._feeds.items()
+            }
@@ -0,0 +1,56 @@
+# app/rate_limiter.py
+import os
+import time
+import hashlib
+import threading
+
+
+class RateLimiter:
+    """Token buckets for requests per minute and tokens per minute.
+
+    acquire() blocks until both buckets can cover the call, so concurrent callers
+    never burst past the provider's limits.
+    """
+
+    def __init__(self, requests_per_minute=None, tokens_per_minute=None):
+        self.rpm = requests_per_minute or float(os.getenv("LLM_RPM", "500"))
+        self.tpm = tokens_per_minute or float(os.getenv("LLM_TPM", "200000"))
+        self._requests = self.rpm
+        self._tokens = self.tpm
+        self._last = time.monotonic()
+        self._cond = threading.Condition()
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self._last
+        self._last = now
+        self._requests = min(self.rpm, self._requests + elapsed * self.rpm / 60)
+        self._tokens = min(self.tpm, self._tokens + elapsed * self.tpm / 60)
+
+    def acquire(self, tokens=0):
+        """Wait for capacity for one request of `tokens` tokens. Returns seconds waited."""
+        # A call bigger than the whole bucket would never fit; let it through at a full bucket
+        tokens = min(tokens, self.tpm)
+        start = time.monotonic()
+        with self._cond:
+            while True:
+                self._refill()
+                if self._requests >= 1 and self._tokens >= tokens:
+                    self._requests -= 1
+                    self._tokens -= tokens
+                    return time.monotonic() - start
+                wait = max((1 - self._requests) * 60 / self.rpm, (tokens - self._tokens) * 60 / self.tpm)
+                self._cond.wait(max(wait, 0.01))
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(api_key):
+    """One limiter per API key (limits are per key), stored under the key's hash."""
+    key = hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()
+    with _limiters_lock:
+        if key not in _limiters:
+            _limiters[key] = RateLimiter()
+        return _limiters[key]
@@ -0,0 +1,110 @@
+# app/relevance.py
+import os
+import re
+import calendar
+from datetime import datetime
+import numpy as np
+
+from src.token_utils import estimate_tokens
+from src.summarizer import entry_block
+
+# Entries sent to the map stage per request (0 = no cap), and a token budget for them
+RANK_MAX_ENTRIES = int(os.getenv("RANK_MAX_ENTRIES", "0"))
+RANK_TOKEN_BUDGET = int(os.getenv("RANK_TOKEN_BUDGET", "0"))
+# Share of the score that comes from recency rather than text match
+RANK_RECENCY_WEIGHT = float(os.getenv("RANK_RECENCY_WEIGHT", "0.3"))
+# Age at which the recency part of the score halves
+RANK_HALF_LIFE_HOURS = float(os.getenv("RANK_HALF_LIFE_HOURS", "24"))
+
+# BM25 parameters
+K1 = 1.5
+B = 0.75
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset("""
+a an and are as at be by for from has have in interest into is it its of on or that the their this
+to was were will with who what which about more most new audience general enthusiasts readers
+""".split())
+
+
+def _tokens(text):
+    return [w for w in _WORD_RE.findall((text or "").lower()) if w not in _STOPWORDS]
+
+
+def relevance_query(subject_area, audience_description):
+    """Query terms for ranking: the subject key plus the audience description."""
+    return sorted(set(_tokens(f"{subject_area} {audience_description}")))
+
+
+def bm25_scores(entries, query_terms):
+    """BM25 of each entry's title (counted twice) and summary against the query terms.
+
+    Query terms of four letters or more also match words they prefix ("astro" matches
+    "astronomy"), standing in for stemming.
+    """
+    docs = [_tokens(e.get("title")) * 2 + _tokens(e.get("summary")) for e in entries]
+    if not docs or not query_terms:
+        return np.zeros(len(docs))
+    vocab = {}
+    rows, cols = [], []
+    for i, words in enumerate(docs):
+        for w in words:
+            rows.append(i)
+            cols.append(vocab.setdefault(w, len(vocab)))
+    counts = np.zeros((len(docs), max(len(vocab), 1)))
+    np.add.at(counts, (np.array(rows, dtype=int), np.array(cols, dtype=int)), 1)
+
+    # vocab word -> query term matrix, so one matmul gives term frequencies per document
+    match = np.zeros((counts.shape[1], len(query_terms)))
+    for word, col in vocab.items():
+        for j, q in enumerate(query_terms):
+            if word == q or (len(q) >= 4 and word.startswith(q)):
+                match[col, j] = 1
+    tf = counts @ match
+
+    lengths = counts.sum(axis=1)
+    avg_length = lengths.mean() or 1.0
+    df = (tf > 0).sum(axis=0)
+    idf = np.log(1 + (len(docs) - df + 0.5) / (df + 0.5))
+    norm = K1 * (1 - B + B * lengths / avg_length)
+    return ((tf * (K1 + 1)) / (tf + norm[:, None]) * idf).sum(axis=1)
+
+
+def recency_scores(entries, now=None, half_life_hours=RANK_HALF_LIFE_HOURS):
+    now = calendar.timegm((now or datetime.utcnow()).utctimetuple())
+    published = np.array([calendar.timegm(e["published"].utctimetuple()) for e in entries], dtype=float)
+    age_hours = np.clip((now - published) / 3600, 0, None)
+    return 0.5 ** (age_hours / half_life_hours)
+
+
+def rank_entries(entries, subject_area, audience_description, recency_weight=RANK_RECENCY_WEIGHT, now=None):
+    """Scores in [0, 1]: BM25 against subject + audience (scaled by the best entry) blended with recency."""
+    if not entries:
+        return np.zeros(0)
+    text = bm25_scores(entries, relevance_query(subject_area, audience_description))
+    if text.max() > 0:
+        text = text / text.max()
+    return (1 - recency_weight) * text + recency_weight * recency_scores(entries, now)
+
+
+def select_relevant(entries, subject_area, audience_description, model, max_entries=None, token_budget=None):
+    """Keep the best-scoring entries, at most `max_entries` of them and `token_budget` tokens
+    of entry blocks (0/None = no limit). Returns (kept, dropped); kept stays in input order."""
+    max_entries = RANK_MAX_ENTRIES if max_entries is None else max_entries
+    token_budget = RANK_TOKEN_BUDGET if token_budget is None else token_budget
+    if not entries or ((not max_entries or len(entries) <= max_entries) and not token_budget):
+        return list(entries), []
+
+    order = np.argsort(-rank_entries(entries, subject_area, audience_description), kind="stable")
+    keep, used = set(), 0
+    for idx in order.tolist():
+        if max_entries and len(keep) >= max_entries:
+            break
+        tokens = estimate_tokens(model, entry_block(entries[idx]))
+        if token_budget and used + tokens > token_budget and keep:
+            continue
+        keep.add(idx)
+        used += tokens
+    kept = [e for i, e in enumerate(entries) if i in keep]
+    dropped = [e for i, e in enumerate(entries) if i not in keep]
+    return kept, dropped
@@ -1,46 +1,184 @@
 # app/rss_utils.py
 import feedparser
-from bs4 import BeautifulSoup
+import os
+import time
 import logging
 from datetime import datetime, timedelta
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeoutError
+from src.feed_cache import get_feed_cache, DEFAULT_RETENTION_DAYS
+from src.feed_fetcher import get_feed_fetcher
+from src.feed_stream import iter_feed_items, FeedStreamError
+from src.text_extract import get_text_extractor
+from src.feed_health import get_feed_health
 
 logger = logging.getLogger(__name__)
 
-def parse_feed(feed_url, cutoff_dt):
-    try:
-        feed = feedparser.parse(feed_url)
-    except Exception as e:
-        logger.warning(f"Failed to download {feed_url}: {e}")
-        return []
-    results = []
+# "incremental" streams items and stops at the cutoff; "feedparser" parses the whole document
+PARSE_MODE = os.getenv("FEED_PARSE_MODE", "incremental")
+# Timeout for background probes of feeds whose circuit is open
+PROBE_TIMEOUT = float(os.getenv("FEED_PROBE_TIMEOUT", "5"))
+
+# Parses feeds that finish after a request's deadline
+_late_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="late-feed")
+
+def _entries_since(entries, cutoff_dt):
+    return [e for e in entries if e["published"] > cutoff_dt]
+
+def _usable_cache(cache, feed_url, cutoff_dt):
+    cached = cache.get(feed_url)
+    # Cached entries only cover the window they were stored for
+    if cached and cached["horizon"] > cutoff_dt:
+        return None
+    return cached
+
+def _clean_html(html):
+    return get_text_extractor()(html)
+
+def _parse_with_feedparser(feed_url, resp, horizon):
+    feed = feedparser.parse(resp["content"], response_headers=dict(resp["headers"], **{"content-location": feed_url}))
+    kept = []
     for entry in getattr(feed, "entries", []):
         if hasattr(entry, "published_parsed"):
             published = datetime(*entry.published_parsed[:6])
-            if published > cutoff_dt:
-                text = BeautifulSoup(entry.get("summary", ""), "html.parser").get_text()
-                results.append({
+            if published > horizon:
+                text = _clean_html(entry.get("summary", ""))
+                kept.append({
                     "title": entry.get("title"),
                     "link": entry.get("link"),
                     "published": published,
                     "summary": text,
                 })
-    logger.info(f"From {feed_url}, got {len(results)} new entries")
+    return kept
+
+def _process_response(feed_url, cutoff_dt, cache, cached, resp):
+    """Turn a fetcher response into entries. Returns (entries, "hit" | "miss" | "error")."""
+    if cached and resp["status"] == 304:
+        cache.record_hit()
+        results = _entries_since(cached["entries"], cutoff_dt)
+        logger.info(f"From {feed_url}, not modified, reused {len(results)} cached entries")
+        return results, "hit"
+    if resp["error"]:
+        if cached:
+            # Download failed - serve the last good copy rather than nothing
+            logger.warning(f"Failed to download {feed_url}, serving cached entries: {resp['error']}")
+            return _entries_since(cached["entries"], cutoff_dt), "error"
+        logger.warning(f"Failed to download {feed_url}: {resp['error']}")
+        return [], "error"
+
+    cache.record_miss()
+    horizon = min(cutoff_dt, datetime.utcnow() - timedelta(days=DEFAULT_RETENTION_DAYS))
+    kept = None
+    if PARSE_MODE == "incremental":
+        try:
+            kept = [dict(item, summary=_clean_html(item["summary"]))
+                    for item in iter_feed_items(resp["content"], horizon)]
+        except FeedStreamError as e:
+            logger.info(f"Falling back to feedparser for {feed_url}: {e}")
+    if kept is None:
+        kept = _parse_with_feedparser(feed_url, resp, horizon)
+    cache.put(feed_url, resp["etag"], resp["modified"], kept, horizon)
+
+    results = _entries_since(kept, cutoff_dt)
+    logger.info(f"From {feed_url}, got {len(results)} new entries in {resp['elapsed']:.2f}s")
+    return results, "miss"
+
+def _parse_feed(feed_url, cutoff_dt, cache=None, fetcher=None):
+    cache = cache or get_feed_cache()
+    fetcher = fetcher or get_feed_fetcher()
+    cached = _usable_cache(cache, feed_url, cutoff_dt)
+    resp = fetcher.fetch_sync(feed_url, cached and cached.get("etag"), cached and cached.get("modified"))
+    return _process_response(feed_url, cutoff_dt, cache, cached, resp)
+
+def parse_feed(feed_url, cutoff_dt, cache=None, fetcher=None):
+    results, _ = _parse_feed(feed_url, cutoff_dt, cache=cache, fetcher=fetcher)
     return results
 
-def fetch_recent_entries(feed_urls, days_limit=1, max_workers=5):
+def _probe(fetcher, health, url):
+    """Background re-try of a feed whose circuit is open; only updates its health."""
+    def on_done(fut):
+        resp = fut.result()
+        health.record(url, resp["error"] is None, resp["elapsed"], resp["error"])
+    fetcher.submit(url, timeout=PROBE_TIMEOUT).add_done_callback(on_done)
+
+def _finish_late(fut, url, cutoff, cache, cached, health):
+    """Fetch finished after the caller's deadline: still record health and fill the cache
+    so the next request gets it as a cache hit."""
+    def process():
+        try:
+            resp = fut.result()
+            health.record(url, resp["error"] is None, resp["elapsed"], resp["error"])
+            _process_response(url, cutoff, cache, cached, resp)
+        except Exception as e:
+            logger.warning(f"Error finishing late feed {url}: {e}")
+    # Done-callbacks run on the fetcher's event loop; keep parsing off it
+    fut.add_done_callback(lambda _: _late_pool.submit(process))
+
+def iter_recent_entries(feed_urls, days_limit=1, cache=None, fetcher=None, stats=None, health=None, deadline=None):
+    """Yield (feed_url, entries, status) for each feed as soon as it is fetched and parsed.
+    status is "hit" (not modified), "miss" (downloaded), "error", "skipped" (circuit open;
+    cached entries, if any, are served and the feed is re-probed in the background) or
+    "late" (not done within `deadline` seconds; cached entries, if any, are served and
+    the download finishes in the background into the cache).
+    All feeds are requested at once through the shared fetcher (per-host limits apply).
+    If `stats` is a dict, it is filled with this call's cache "hits", "misses", "errors",
+    "skipped" and "late" counts, plus the URLs of late feeds under "late_feeds"."""
+    start = time.monotonic()
     cutoff = datetime.utcnow() - timedelta(days=days_limit)
-    entries = []
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        futures = {executor.submit(parse_feed, url, cutoff): url for url in feed_urls}
-        for fut in as_completed(futures):
-            url = futures[fut]
+    cache = cache or get_feed_cache()
+    fetcher = fetcher or get_feed_fetcher()
+    health = health or get_feed_health()
+    if stats is not None:
+        stats.update({"hits": 0, "misses": 0, "errors": 0, "skipped": 0, "late": 0, "late_feeds": []})
+
+    futures, skipped = {}, []
+    for url in feed_urls:
+        cached = _usable_cache(cache, url, cutoff)
+        if health.is_open(url):
+            skipped.append((url, cached))
+            if health.claim_probe(url):
+                _probe(fetcher, health, url)
+            continue
+        fut = fetcher.submit(url, cached and cached.get("etag"), cached and cached.get("modified"))
+        futures[fut] = (url, cached)
+
+    for url, cached in skipped:
+        logger.info(f"Skipping {url}, circuit open")
+        if stats is not None:
+            stats["skipped"] += 1
+        yield url, _entries_since(cached["entries"], cutoff) if cached else [], "skipped"
+
+    pending = set(futures)
+    try:
+        timeout = None if deadline is None else max(0.0, deadline - (time.monotonic() - start))
+        for fut in as_completed(futures, timeout=timeout):
+            pending.discard(fut)
+            url, cached = futures[fut]
             try:
-                res = fut.result()
+                resp = fut.result()
+                health.record(url, resp["error"] is None, resp["elapsed"], resp["error"])
+                res, status = _process_response(url, cutoff, cache, cached, resp)
             except Exception as e:
                 logger.warning(f"Error parsing feed {url}: {e}")
-                res = []
-            entries.extend(res)
+                res, status = [], "error"
+            if stats is not None:
+                stats[{"hit": "hits", "miss": "misses"}.get(status, "errors")] += 1
+            yield url, res, status
+    except FuturesTimeoutError:
+        for fut in pending:
+            url, cached = futures[fut]
+            logger.warning(f"Feed {url} missed the {deadline:.0f}s fetch deadline")
+            _finish_late(fut, url, cutoff, cache, cached, health)
+            if stats is not None:
+                stats["late"] += 1
+                stats["late_feeds"].append(url)
+            yield url, _entries_since(cached["entries"], cutoff) if cached else [], "late"
+
+def fetch_recent_entries(feed_urls, days_limit=1, cache=None, fetcher=None, stats=None, deadline=None):
+    """Fetch entries newer than `days_limit` days from all feeds, newest first. With a
+    `deadline` (seconds), returns what has arrived by then; see iter_recent_entries."""
+    entries = []
+    for _, res, _ in iter_recent_entries(feed_urls, days_limit, cache=cache, fetcher=fetcher, stats=stats, deadline=deadline):
+        entries.extend(res)
     # sort and dedupe if needed
     entries.sort(key=lambda e: e["published"], reverse=True)
     return entries
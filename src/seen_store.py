@@ -0,0 +1,112 @@
+# app/seen_store.py
+import os
+import time
+import hashlib
+import logging
+import threading
+
+from src.response_parser import normalize_url
+from src.sqlite_utils import connect, transaction
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS seen (
+    scope TEXT NOT NULL,
+    link_key TEXT NOT NULL,
+    seen_at REAL NOT NULL,
+    PRIMARY KEY (scope, link_key)
+);
+CREATE INDEX IF NOT EXISTS idx_seen_seen_at ON seen (seen_at);
+"""
+
+# Prune at most once per this many writes
+PRUNE_EVERY = 100
+
+
+def scope_for_api_key(api_key, subject_area=None, content_type=None, audience_key=None):
+    """Seen-sets are per user and per digest: an entry summarized for one subject, content
+    type or audience is still new to the others. The API key is the only identity we
+    have, so store a hash."""
+    scope = "|".join([api_key or "", subject_area or "", content_type or "", audience_key or ""])
+    return hashlib.sha256(scope.encode("utf-8")).hexdigest()[:16]
+
+
+class SeenTracker:
+    """On-disk seen-entry index shared by every session and uvicorn worker.
+
+    Marks expire after `ttl_seconds`, and the table is cut back to the newest
+    `max_entries` marks, so it stays bounded however many links pass through.
+    """
+
+    def __init__(self, db_path=None, ttl_seconds=None, max_entries=None):
+        self.db_path = db_path or os.getenv("SEEN_STORE_PATH", os.path.join("data", "seen.db"))
+        self.ttl_seconds = ttl_seconds or float(os.getenv("SEEN_TTL_SECONDS", str(7 * 24 * 3600)))
+        self.max_entries = max_entries or int(os.getenv("SEEN_MAX_ENTRIES", "200000"))
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._conn = connect(self.db_path)
+        self._conn.executescript(SCHEMA)
+
+    def seen(self, scope, links):
+        """Subset of `links` already marked (and not expired) for this scope."""
+        keys = {normalize_url(link): link for link in links if link}
+        if not keys:
+            return set()
+        cutoff = time.time() - self.ttl_seconds
+        found = set()
+        key_list = list(keys)
+        with self._lock:
+            # Stay well under SQLite's bound-parameter limit
+            for i in range(0, len(key_list), 500):
+                batch = key_list[i:i + 500]
+                marks = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT link_key FROM seen WHERE scope = ? AND seen_at > ? AND link_key IN ({marks})",
+                    [scope, cutoff, *batch],
+                ).fetchall()
+                found.update(keys[r["link_key"]] for r in rows)
+        return found
+
+    def mark_seen(self, scope, links):
+        now = time.time()
+        rows = [(scope, normalize_url(link), now) for link in links if link]
+        if not rows:
+            return
+        with self._lock:
+            with transaction(self._conn):
+                self._conn.executemany("""
+                    INSERT INTO seen (scope, link_key, seen_at) VALUES (?, ?, ?)
+                    ON CONFLICT(scope, link_key) DO UPDATE SET seen_at = excluded.seen_at
+                """, rows)
+            self._writes += 1
+            if self._writes % PRUNE_EVERY == 1:
+                self._prune()
+
+    def _prune(self):
+        self._conn.execute("DELETE FROM seen WHERE seen_at <= ?", (time.time() - self.ttl_seconds,))
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM seen").fetchone()
+        if count > self.max_entries:
+            self._conn.execute("""
+                DELETE FROM seen WHERE rowid IN (
+                    SELECT rowid FROM seen ORDER BY seen_at ASC LIMIT ?
+                )
+            """, (count - self.max_entries,))
+            logger.info(f"Pruned {count - self.max_entries} oldest seen-entry marks")
+
+    def prune(self):
+        with self._lock:
+            self._prune()
+
+
+_default_tracker = None
+_default_tracker_lock = threading.Lock()
+
+
+def get_seen_tracker():
+    """Process-wide seen tracker, created on first use."""
+    global _default_tracker
+    with _default_tracker_lock:
+        if _default_tracker is None:
+            _default_tracker = SeenTracker()
+        return _default_tracker
@@ -0,0 +1,30 @@
+# app/sqlite_utils.py
+import os
+import sqlite3
+from contextlib import contextmanager
+
+
+def connect(db_path):
+    """Open a SQLite database shared across threads and processes (WAL journal)."""
+    db_dir = os.path.dirname(db_path)
+    if db_dir:
+        os.makedirs(db_dir, exist_ok=True)
+    conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+@contextmanager
+def transaction(conn):
+    """BEGIN ... COMMIT on a connection from connect(). On any error the transaction is
+    rolled back before re-raising, so a shared connection is never left inside it."""
+    conn.execute("BEGIN")
+    try:
+        yield conn
+        conn.execute("COMMIT")
+    except BaseException:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
@@ -1,10 +1,166 @@
 from src.config import Config
 from src.prompt_templates import BASE_BULK_TEMPLATE, BASE_ENTRY_TEMPLATE, SYSTEM_PROMPT_TEMPLATE
-from src.token_utils import estimate_tokens
+import os
+import re
+import json
+import logging
+import time
+import calendar
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from src.token_utils import estimate_tokens, estimate_openai_cost
+from src.rate_limiter import get_rate_limiter
+from src.llm_client import LLMError
+from src.llm_scheduler import PRIORITY_BULK, PRIORITY_INTERACTIVE
+from src.chunk_summary_store import get_chunk_summary_store, chunk_key
+
+logger = logging.getLogger(__name__)
+
+# Chunk summaries requested at once in the map stage
+MAP_CONCURRENCY = int(os.getenv("LLM_MAP_CONCURRENCY", "4"))
+# Completion tokens reserved per map call when rate limiting
+MAP_COMPLETION_TOKENS = 1000
+# Token budget for the summaries packed into one reduce call
+REDUCE_TOKEN_BUDGET = int(os.getenv("LLM_REDUCE_TOKEN_BUDGET", "8000"))
+# Prompt tokens and entries packed into one batched entry-summary call
+ENTRY_BATCH_TOKENS = int(os.getenv("LLM_ENTRY_BATCH_TOKENS", "6000"))
+ENTRY_BATCH_MAX = int(os.getenv("LLM_ENTRY_BATCH_MAX", "8"))
+# Width of the time buckets that stable chunks are cut from
+CHUNK_BUCKET_HOURS = float(os.getenv("CHUNK_BUCKET_HOURS", "24"))
+# LLM stages: chunk summaries (map), the overall digest (reduce) and per-entry summaries
+STAGES = ("map", "reduce", "entry")
+# Per-stage model/temperature, e.g. LLM_MAP_MODEL=gpt-4.1-nano; unset = the client's own
+STAGE_MODELS = {stage: os.getenv(f"LLM_{stage.upper()}_MODEL") for stage in STAGES}
+STAGE_TEMPERATURES = {stage: os.getenv(f"LLM_{stage.upper()}_TEMPERATURE") for stage in STAGES}
+
+def entry_block(e, budgeted=True):
+    """An entry as sent to the map stage, with its budgeted summary (see src.entry_budget)
+    when it has one. budgeted=False gives the full summary that entry prompts use."""
+    summary = e.get("budgeted_summary", e["summary"]) if budgeted else e["summary"]
+    return f"Title: {e['title']}\nSummary: {summary}\nLink: {e['link']}"
+
+class EntryChunker:
+    """Greedy token-limited packing: add entries one at a time, get back chunks once they are full."""
+    def __init__(self, model, token_limit=6000):
+        self.model = model
+        self.token_limit = token_limit
+        self.current = []
+        self.current_tokens = 0
+
+    def add(self, e):
+        """Add one entry. Returns a list holding the chunk it closed, if any."""
+        tokens = estimate_tokens(self.model, entry_block(e))
+        if self.current_tokens + tokens > self.token_limit and self.current:
+            full = self.current
+            self.current, self.current_tokens = [e], tokens
+            return [full]
+        self.current.append(e)
+        self.current_tokens += tokens
+        return []
+
+    def flush(self):
+        full, self.current, self.current_tokens = self.current, [], 0
+        return [full] if full else []
+
+def time_bucket(published, hours=CHUNK_BUCKET_HOURS):
+    return int(calendar.timegm(published.utctimetuple()) // (hours * 3600))
+
+def split_stable_chunks(model, entries, token_limit=6000):
+    """First pass of stable_chunks: entries grouped by (feed, time bucket), oldest first
+    within a group, split by tokens. Returns (full_chunks, tails): the chunks that filled
+    up inside one group, and each group's leftover entries for pack_tails."""
+    groups = {}
+    for e in entries:
+        groups.setdefault((e.get("feed", ""), time_bucket(e["published"])), []).append(e)
+    full, tails = [], []
+    for key in sorted(groups, key=lambda k: (-k[1], k[0])):
+        chunker = EntryChunker(model, token_limit)
+        for e in sorted(groups[key], key=lambda e: (e["published"], e["link"])):
+            full.extend(chunker.add(e))
+        tails.extend(chunker.current)
+    return full, tails
+
+def pack_tails(model, tails, token_limit=6000):
+    """Second pass of stable_chunks: leftover entries share chunks across feeds within each
+    time bucket (newest bucket first), ordered by (feed, published, link)."""
+    buckets = {}
+    for e in tails:
+        buckets.setdefault(time_bucket(e["published"]), []).append(e)
+    chunks = []
+    for bucket in sorted(buckets, reverse=True):
+        chunker = EntryChunker(model, token_limit)
+        for e in sorted(buckets[bucket], key=lambda e: (e.get("feed", ""), e["published"], e["link"])):
+            chunks.extend(chunker.add(e))
+        chunks.extend(chunker.flush())
+    return chunks
+
+def stable_chunks(model, entries, token_limit=6000):
+    """Chunk entries so boundaries survive refreshes. Feeds busy enough to fill a chunk in
+    one time bucket get chunks of their own; the rest of each bucket is packed across
+    feeds in a fixed order, so small feeds do not cost one call each. A new entry only
+    changes the chunks of its own bucket, so the others can be served from the chunk
+    summary store."""
+    full, tails = split_stable_chunks(model, entries, token_limit)
+    return full + pack_tails(model, tails, token_limit)
+
+def parse_batch_summaries(reply, count):
+    """{index: summary} from a batched reply (a JSON object keyed "1".."count"), tolerating code
+    fences and text around the object. Missing, empty or unparseable items are left out."""
+    match = re.search(r"\{.*\}", reply or "", re.DOTALL)
+    if not match:
+        return {}
+    try:
+        data = json.loads(match.group(0))
+    except ValueError:
+        return {}
+    if not isinstance(data, dict):
+        return {}
+    parsed = {}
+    for i in range(count):
+        text = data.get(str(i + 1))
+        if isinstance(text, str) and text.strip():
+            parsed[i] = text.strip()
+    return parsed
+
+def collect_chunk_summaries(futures):
+    """Gather map-stage results in order. Failed chunks are logged and skipped; if every
+    chunk failed, the last error is raised. Returns (summaries, cost, failed_count)."""
+    summaries, cost, errors = [], 0, []
+    for fut in futures:
+        try:
+            summary, chunk_cost = fut.result()
+        except LLMError as e:
+            logger.warning(f"Skipping chunk: {e}")
+            errors.append(e)
+            continue
+        summaries.append(summary)
+        cost += chunk_cost
+    if errors and not summaries:
+        raise LLMError(f"All {len(errors)} chunk summaries failed: {errors[-1]}")
+    return summaries, cost, len(errors)
 
 class Summarizer:
-    def __init__(self, llm_client):
+    def __init__(self, llm_client, map_concurrency=MAP_CONCURRENCY, rate_limiter=None, chunk_store=None,
+                 stage_models=None, stage_temperatures=None):
         self.llm = llm_client
+        self.stage_models = {stage: model for stage, model in (stage_models or STAGE_MODELS).items() if model}
+        self.stage_temperatures = {stage: float(t) for stage, t in (stage_temperatures or STAGE_TEMPERATURES).items()
+                                   if t not in (None, "")}
+        for model in self.stage_models.values():
+            # Fail now rather than after a paid call that cannot be priced
+            estimate_openai_cost(model, 0, 0)
+        # Calls, cost and seconds per stage since the last reset_stage_stats()
+        self.stage_stats = {}
+        self._stage_lock = threading.Lock()
+        self.reset_stage_stats()
+        self.map_concurrency = map_concurrency
+        self.rate_limiter = rate_limiter or get_rate_limiter(getattr(llm_client, "api_key", None))
+        self.chunk_store = chunk_store or get_chunk_summary_store()
+        # Map-stage chunks answered from the chunk store instead of the LLM
+        self.chunks_reused = 0
+        self._reused_lock = threading.Lock()
+        # Reduce levels used by the last summarize_overall_summaries call
+        self.last_reduce_levels = 0
 
     def get_system_prompt(self, subject_area, audience_key):
         aud_desc = Config.AUDIENCES.get(audience_key, "")
@@ -26,6 +182,22 @@ class Summarizer:
             ).strip()
         return [{"role": "system", "content": sys_prompt}, {"role": "user", "content": user_prompt}]
 
+    def make_batch_entry_messages(self, entries, subject_area, audience_key, content_type, max_length):
+        """One request for several entries: each entry's usual prompt under an id, answered as a
+        JSON object of id -> summary. The system prompt is sent once for the whole batch."""
+        sys_prompt = self.get_system_prompt(subject_area, audience_key)
+        sections = [
+            f"=== Entry {i} ===\n" + self.make_entry_messages(e, subject_area, audience_key, content_type, max_length)[1]["content"]
+            for i, e in enumerate(entries, start=1)
+        ]
+        example = ", ".join(f'"{i}": "..."' for i in range(1, len(entries) + 1))
+        user_prompt = (
+            f"Summarize each of the {len(entries)} entries below separately, following the instructions given with it.\n"
+            f"Reply with only a JSON object mapping each entry number to its summary: {{{example}}}\n\n"
+            + "\n\n".join(sections)
+        )
+        return [{"role": "system", "content": sys_prompt}, {"role": "user", "content": user_prompt}]
+
     def make_bulk_messages(self, blocks, subject_area, audience_key, content_type, top_k, max_length):
         sys_prompt = self.get_system_prompt(subject_area, audience_key)
         user_prompt = BASE_BULK_TEMPLATE.format(
@@ -37,61 +209,188 @@ class Summarizer:
         ).strip()
         return [{"role": "system", "content": sys_prompt}, {"role": "user", "content": user_prompt}]
     
+    def model_for(self, stage):
+        """Model that runs `stage`; its tokenizer is used for that stage's token estimates."""
+        return self.stage_models.get(stage, self.llm.model)
+
+    def reset_stage_stats(self):
+        with self._stage_lock:
+            self.stage_stats = {stage: {"calls": 0, "cost": 0.0, "seconds": 0.0} for stage in STAGES}
+
+    def stage_report(self):
+        """Model, LLM calls, cost and summed call time per stage that made calls."""
+        with self._stage_lock:
+            return {stage: dict(stats, model=self.model_for(stage), cost=round(stats["cost"], 6),
+                                seconds=round(stats["seconds"], 2))
+                    for stage, stats in self.stage_stats.items() if stats["calls"]}
+
     # SUMMARIZE SINGLE ENTRY
-    def summarize_entry(self, entry, subject_area, audience_key, content_type):
+    def _chat(self, msg, on_delta=None, priority=PRIORITY_BULK, stage="entry"):
+        # Only pass options that are in use so plain chat(messages, return_cost_info) clients keep working
+        kwargs = {}
+        if on_delta is not None:
+            kwargs["on_delta"] = on_delta
+        if priority != PRIORITY_BULK:
+            kwargs["priority"] = priority
+        if stage in self.stage_models:
+            kwargs["model"] = self.stage_models[stage]
+        if stage in self.stage_temperatures:
+            kwargs["temperature"] = self.stage_temperatures[stage]
+        start = time.monotonic()
+        summary, cost = self.llm.chat(msg, return_cost_info=True, **kwargs)
+        with self._stage_lock:
+            stats = self.stage_stats[stage]
+            stats["calls"] += 1
+            stats["cost"] += cost
+            stats["seconds"] += time.monotonic() - start
+        return summary, cost
+
+    def summarize_entry(self, entry, subject_area, audience_key, content_type, on_delta=None,
+                        priority=PRIORITY_INTERACTIVE):
         msg = self.make_entry_messages(entry, subject_area, audience_key, content_type, max_length=300)
-        summary, cost = self.llm.chat(msg, return_cost_info=True)
+        summary, cost = self._chat(msg, on_delta, priority)
         return summary, cost
     
-    # SUMMARIZE BULK ENTRIES - CHUNK ENTRIES
-    def chunk_entries(self, model, entries, token_limit=6000):
-        chunks, current, current_tokens = [], [], 0
+    def batch_entries(self, entries, token_budget=ENTRY_BATCH_TOKENS, max_entries=ENTRY_BATCH_MAX):
+        """Pack entries into batches under `token_budget` prompt tokens and `max_entries` each."""
+        batches, current, current_tokens = [], [], 0
         for e in entries:
-            block = f"Title: {e['title']}\nSummary: {e['summary']}\nLink: {e['link']}"
-            tokens = estimate_tokens(model, block)
-            if current_tokens + tokens > token_limit and current:
-                chunks.append(current)
-                current = [e]
-                current_tokens = tokens
-            else:
-                current.append(e)
-                current_tokens += tokens
+            tokens = estimate_tokens(self.model_for("entry"), entry_block(e, budgeted=False))
+            if current and (current_tokens + tokens > token_budget or len(current) >= max_entries):
+                batches.append(current)
+                current, current_tokens = [], 0
+            current.append(e)
+            current_tokens += tokens
         if current:
-            chunks.append(current)
-        return chunks
+            batches.append(current)
+        return batches
 
-    def summarize_bulk_chunks(self, entries, subject_area, audience_key, content_type, top_k):
-        chunked_summaries, chunked_cost = [], 0
-        entry_chunks = self.chunk_entries(self.llm.model, entries)
-        for chunk in entry_chunks:
-            chunk_blocks = [f"Title: {e['title']}\nSummary: {e['summary']}\nLink: {e['link']}" for e in chunk]
-            msg = self.make_bulk_messages(
-                blocks=chunk_blocks, 
-                subject_area=subject_area, 
-                audience_key=audience_key,
-                content_type=content_type,
-                top_k=top_k,
-                max_length=1000
+    def summarize_entry_batch(self, entries, subject_area, audience_key, content_type, priority=PRIORITY_BULK):
+        """Summaries for a batch in one call, as [(summary, cost)] in entry order. The call's cost
+        is split by summary length. Entries the reply leaves out (or an unparseable reply) fall
+        back to one summarize_entry call each."""
+        results = [None] * len(entries)
+        wasted = 0.0
+        if len(entries) > 1:
+            msg = self.make_batch_entry_messages(entries, subject_area, audience_key, content_type, max_length=300)
+            try:
+                reply, cost = self._chat(msg, priority=priority)
+                parsed = parse_batch_summaries(reply, len(entries))
+            except LLMError as e:
+                logger.warning(f"Batched entry summaries failed, falling back to single calls: {e}")
+                cost, parsed = 0.0, {}
+            if not parsed:
+                # Nothing usable came back; the call was still paid for
+                wasted = cost / len(entries)
+            total_chars = sum(len(text) for text in parsed.values())
+            for i, text in parsed.items():
+                results[i] = (text, cost * len(text) / total_chars)
+            if len(parsed) < len(entries):
+                logger.warning(f"Batch reply covered {len(parsed)} of {len(entries)} entries; summarizing the rest singly")
+        for i, e in enumerate(entries):
+            if results[i] is None:
+                summary, cost = self.summarize_entry(e, subject_area, audience_key, content_type, priority=priority)
+                results[i] = (summary, cost + wasted)
+        return results
+
+    def summarize_entries(self, entries, subject_area, audience_key, content_type, priority=PRIORITY_BULK):
+        """Batched summarize_entry for many entries; batches run concurrently. Returns [(summary, cost)]."""
+        batches = self.batch_entries(entries)
+        with ThreadPoolExecutor(max_workers=self.map_concurrency) as pool:
+            per_batch = pool.map(
+                lambda batch: self.summarize_entry_batch(batch, subject_area, audience_key, content_type, priority),
+                batches,
             )
-            summary, cost = self.llm.chat(msg, return_cost_info=True)
-            chunked_summaries.append(summary)
-            chunked_cost += cost
-        # chunked_summary = "\n\n---\n\n".join(chunked_summaries)
-        # unique_top_entries, unique_urls = extract_top_entries_from_summary(chunked_summary, entries, max_count=top_k*len(entry_chunks))
-        return chunked_summaries, chunked_cost #,unique_top_entries, unique_urls
+            return [result for batch_results in per_batch for result in batch_results]
+
+    def count_entry_tokens(self, entries):
+        """Prompt tokens these entries take in the map stage."""
+        return sum(estimate_tokens(self.model_for("map"), entry_block(e)) for e in entries)
+
+    # SUMMARIZE BULK ENTRIES - CHUNK ENTRIES
+    def chunk_entries(self, model, entries, token_limit=6000):
+        return stable_chunks(model, entries, token_limit)
+
+    def summarize_chunk(self, chunk, subject_area, audience_key, content_type, top_k):
+        msg = self.make_bulk_messages(
+            blocks=[entry_block(e) for e in chunk],
+            subject_area=subject_area, 
+            audience_key=audience_key,
+            content_type=content_type,
+            top_k=top_k,
+            max_length=1000
+        )
+        temperature = self.stage_temperatures.get("map", getattr(self.llm, "temperature", None))
+        key = chunk_key(msg, self.model_for("map"), temperature)
+        stored = self.chunk_store.get(key)
+        if stored is not None:
+            with self._reused_lock:
+                self.chunks_reused += 1
+            return stored[0], 0.0
+
+        prompt_tokens = sum(estimate_tokens(self.model_for("map"), m["content"]) for m in msg)
+        self.rate_limiter.acquire(prompt_tokens + MAP_COMPLETION_TOKENS)
+        summary, cost = self._chat(msg, stage="map")
+        self.chunk_store.put(key, summary, cost)
+        return summary, cost
+
+    def summarize_bulk_chunks(self, entries, subject_area, audience_key, content_type, top_k):
+        entry_chunks = self.chunk_entries(self.model_for("map"), entries)
+        # Map stage runs concurrently; results are collected in chunk order
+        with ThreadPoolExecutor(max_workers=self.map_concurrency) as pool:
+            futures = [
+                pool.submit(self.summarize_chunk, chunk, subject_area, audience_key, content_type, top_k)
+                for chunk in entry_chunks
+            ]
+            chunked_summaries, chunked_cost, _ = collect_chunk_summaries(futures)
+        return chunked_summaries, chunked_cost
     
-    def summarize_overall_summaries(self, entries, chunked_summaries, subject_area, audience_key, top_k):
+    def group_summaries(self, summaries, token_budget=REDUCE_TOKEN_BUDGET):
+        """Pack summaries into reduce groups under `token_budget`. Groups hold at least two
+        summaries so every reduce level shrinks the list."""
+        groups, current, current_tokens = [], [], 0
+        for text in summaries:
+            tokens = estimate_tokens(self.model_for("reduce"), text)
+            if current_tokens + tokens > token_budget and len(current) >= 2:
+                groups.append(current)
+                current, current_tokens = [], 0
+            current.append(text)
+            current_tokens += tokens
+        if current:
+            groups.append(current)
+        return groups
+
+    def reduce_group(self, summaries, subject_area, audience_key, top_k, on_delta=None):
         msg = self.make_bulk_messages(
-                blocks=chunked_summaries, 
+                blocks=summaries, 
                 audience_key=audience_key,
                 subject_area=subject_area,
                 content_type='summaries',
                 top_k=top_k,
                 max_length=2000
             )
-        summary, cost = self.llm.chat(msg, return_cost_info=True)
-        
+        prompt_tokens = sum(estimate_tokens(self.model_for("reduce"), m["content"]) for m in msg)
+        self.rate_limiter.acquire(prompt_tokens + MAP_COMPLETION_TOKENS)
+        summary, cost = self._chat(msg, on_delta, stage="reduce")
         return summary, cost
 
+    def summarize_overall_summaries(self, entries, chunked_summaries, subject_area, audience_key, top_k, on_delta=None):
+        """Tree reduce: while the summaries overflow one reduce call, reduce groups of them
+        concurrently into intermediate digests (each keeps its own Top Sources list with
+        links), then make the final call over the last level. Only the final call is
+        streamed to `on_delta`."""
+        level, total_cost, levels = list(chunked_summaries), 0, 1
+        groups = self.group_summaries(level)
+        while len(groups) > 1:
+            with ThreadPoolExecutor(max_workers=self.map_concurrency) as pool:
+                results = list(pool.map(
+                    lambda group: self.reduce_group(group, subject_area, audience_key, top_k), groups
+                ))
+            level = [summary for summary, _ in results]
+            total_cost += sum(cost for _, cost in results)
+            levels += 1
+            groups = self.group_summaries(level)
 
-
+        summary, cost = self.reduce_group(groups[0] if groups else [], subject_area, audience_key, top_k, on_delta)
+        self.last_reduce_levels = levels
+        return summary, total_cost + cost
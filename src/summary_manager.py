@@ -1,83 +1,372 @@
 # app/summary_manager.py
-from src.rss_utils import fetch_recent_entries
-from src.summarizer import Summarizer
+import os
+import queue
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from src.rss_utils import iter_recent_entries
+from src.entry_store import get_entry_store
+from src.dedupe import NearDuplicateIndex, collapse_near_duplicates
+from src.seen_store import get_seen_tracker, scope_for_api_key
+from src.entry_summary_store import get_entry_summary_store
+from src.summarizer import Summarizer, stable_chunks, split_stable_chunks, pack_tails, collect_chunk_summaries
+from src.llm_scheduler import PRIORITY_BULK, PRIORITY_INTERACTIVE
+from src.relevance import select_relevant, RANK_MAX_ENTRIES, RANK_TOKEN_BUDGET
+from src.entry_budget import EntryBudget
 from src.config import Config
 from src.response_parser import extract_top_entries_from_summary
 from src.logger import setup_logger
 
 logger = setup_logger(__name__)
 
+# Feeds ingested more recently than this (or not yet due for their scheduled background
+# poll) are read from the entry store without a fetch
+FEED_FRESH_SECONDS = float(os.getenv("FEED_FRESH_SECONDS", "900"))
+# Time budget for fetching; feeds still downloading after it are served from cache/store
+FETCH_DEADLINE_SECONDS = float(os.getenv("FETCH_DEADLINE_SECONDS", "30"))
+
+# Streamed summary text, yielded next to the str progress messages and the final dict.
+# summarize() streams only the overall digest (stage "bulk"): its top entries are
+# summarized in batched calls and arrive whole in the result dict.
+# iter_summarize_selected() streams a single entry (stage "entry"). Consumers that only
+# look for str/dict events skip these.
+SummaryDelta = namedtuple("SummaryDelta", ["stage", "text"])
+
 class SummaryManager:
-    def __init__(self, llm_client):
+    def __init__(self, llm_client, entry_store=None, seen_tracker=None, only_new=True, entry_summary_store=None):
         self.summarizer = Summarizer(llm_client)
-        # Optionally load persistent seen-IDs or timestamps
-        self.seen_links = set()
+        self.entry_store = entry_store or get_entry_store()
+        self.entry_summary_store = entry_summary_store or get_entry_summary_store()
+        # Links handled by this manager per seen scope; the shared tracker remembers them
+        # across sessions
+        self._seen_by_scope = {}
+        self.seen_tracker = seen_tracker or get_seen_tracker()
+        self.api_key = getattr(llm_client, "api_key", None)
+        self.use_seen_scope()
+        # When set, entries this user already had summarized are skipped
+        self.only_new = only_new
+        self.last_seen_skipped = 0
+        # Feed cache hits/misses of the last fetch
+        self.last_fetch_stats = {}
+        # Near-duplicate entries collapsed in the last fetch
+        self.last_dedupe_stats = {}
+        # Entries left out of the last run by relevance pre-ranking
+        self.last_rank_stats = {}
+        # Boilerplate and overlong summary text cut in the last fetch
+        self.last_budget_stats = {}
+
+    def iter_feed_windows(self, feed_list, days_limit=1, subject_area=None, content_type=None, deadline=None,
+                          refresh=True):
+        """Yield (feed_url, entries) per feed with the feed's window read from the entry store.
+        Feeds ingested within FEED_FRESH_SECONDS, or whose next background poll is not due
+        yet, are served straight from the store; the rest are fetched and upserted first.
+        With refresh=False nothing is fetched (the caller already ingested the feeds)."""
+        self.last_fetch_stats = {}
+        now = datetime.utcnow()
+        cutoff = now - timedelta(days=days_limit)
+        last_fetched = self.entry_store.last_fetched(feed_list)
+        next_polls = self.entry_store.next_polls(feed_list)
+        fresh = [url for url in feed_list
+                 if not refresh
+                 or url in last_fetched and (now - last_fetched[url]).total_seconds() < FEED_FRESH_SECONDS
+                 or url in next_polls and now < next_polls[url]]
+        stale = [url for url in feed_list if url not in fresh]
+
+        for url in fresh:
+            yield url, self.entry_store.query_window([url], cutoff)
+        for url, fetched, status in iter_recent_entries(stale, days_limit=days_limit, stats=self.last_fetch_stats, deadline=deadline):
+            self.entry_store.upsert_entries(fetched, url, subject_area, content_type)
+            if status in ("hit", "miss"):
+                self.entry_store.mark_fetched(url)
+            yield url, self.entry_store.query_window([url], cutoff)
+        self.last_fetch_stats["fresh"] = len(fresh)
+
+    def get_new_entries(self, feed_list, days_limit=1, subject_area=None, content_type=None, deadline=None,
+                        refresh=True):
+        self.last_seen_skipped = 0
+        budget = EntryBudget(self.summarizer.model_for("map"))
+        entries = []
+        for _, feed_entries in self.iter_feed_windows(feed_list, days_limit, subject_area, content_type, deadline,
+                                                      refresh):
+            entries.extend(budget.apply(feed_entries))
+        entries.sort(key=lambda e: e["published"], reverse=True)
+        entries, duplicates = collapse_near_duplicates(self._filter_new(entries))
+        self._record_duplicates(duplicates)
+        self._record_budget(budget, entries)
+        return entries
+
+    def find_entry(self, subject_area, content_type, link=None, selection=None, days_limit=1):
+        """Look up one listed entry in the entry store, without fetching or LLM calls.
+        `link` is the entry's link as listed by summarize(); `selection` (1-based) indexes the
+        stored window newest first and is only a fallback, since a listing filtered by
+        only_new or relevance caps does not share its order. None if nothing matches."""
+        if link:
+            return self.entry_store.get_entry(link)
+        if not selection:
+            return None
+        feeds = Config.SUBJECT_AREAS[subject_area][content_type]
+        entries = self.entry_store.query_window(feeds, datetime.utcnow() - timedelta(days=days_limit))
+        return entries[selection - 1] if 0 < selection <= len(entries) else None
+
+    def select_relevant(self, entries, subject_area, audience_key, max_entries, token_budget):
+        """Entries worth sending to the LLM under the caps (see src.relevance); records what was dropped."""
+        kept, dropped = select_relevant(
+            entries, subject_area, Config.AUDIENCES.get(audience_key, ""), self.summarizer.model_for("map"),
+            max_entries, token_budget,
+        )
+        self.last_rank_stats = {
+            "kept": len(kept),
+            "dropped": len(dropped),
+            "tokens_saved": self.summarizer.count_entry_tokens(dropped),
+        }
+        if dropped:
+            logger.info(f"Relevance cap kept {len(kept)} of {len(entries)} entries, ~{self.last_rank_stats['tokens_saved']} tokens saved")
+        return kept
+
+    def _record_duplicates(self, duplicates):
+        self.last_dedupe_stats = {
+            "removed": len(duplicates),
+            "tokens_saved": self.summarizer.count_entry_tokens(duplicates),
+        }
+        if duplicates:
+            logger.info(f"Collapsed {len(duplicates)} near-duplicate entries, ~{self.last_dedupe_stats['tokens_saved']} tokens saved")
 
-    def get_new_entries(self, feed_list, days_limit=1):
-        entries = fetch_recent_entries(feed_list, days_limit=days_limit)
+    def _record_budget(self, budget, entries):
+        stats = self.last_budget_stats = budget.stats(entries)
+        if stats["tokens_saved"]:
+            logger.info(f"Entry budget trimmed {stats['trimmed_entries']} summaries and "
+                        f"{stats['boilerplate_sentences']} boilerplate sentences, ~{stats['tokens_saved']} tokens saved")
+
+    def use_seen_scope(self, subject_area=None, content_type=None, audience_key=None):
+        """Track seen entries for this digest (API key + subject/content type/audience)."""
+        self.seen_scope = scope_for_api_key(self.api_key, subject_area, content_type, audience_key)
+        self.seen_links = self._seen_by_scope.setdefault(self.seen_scope, set())
+
+    def _filter_new(self, entries):
         # filter out seen ones
         new = [e for e in entries if e["link"] not in self.seen_links]
+        if self.only_new and new:
+            already = self.seen_tracker.seen(self.seen_scope, [e["link"] for e in new])
+            self.last_seen_skipped += len(already)
+            new = [e for e in new if e["link"] not in already]
         # optionally update seen
         for e in new:
             self.seen_links.add(e["link"])
         return new
+
+    def commit_seen(self, entries):
+        """Remember summarized entries (and their duplicates' links) for later sessions.
+        Runs that read the whole window (only_new=False) leave the seen-set alone."""
+        if not self.only_new:
+            return
+        links = [e["link"] for e in entries]
+        links += [alt for e in entries for alt in e.get("alt_links", [])]
+        self.seen_tracker.mark_seen(self.seen_scope, links)
     
-    def summarize_selected(self, entry, subject_area, audience_key, content_type):
-        summary, cost_info = self.summarizer.summarize_entry(entry, subject_area, audience_key, content_type)
+    def _stream_call(self, stage, fn, *args, **kwargs):
+        """Run fn(*args, on_delta=..., **kwargs) on a thread and yield SummaryDelta events as
+        text arrives. Use with `yield from`; evaluates to fn's return value."""
+        pieces = queue.Queue()
+        done = object()
+        outcome = {}
+
+        def run():
+            try:
+                outcome["value"] = fn(*args, on_delta=pieces.put, **kwargs)
+            except Exception as e:
+                outcome["error"] = e
+            finally:
+                pieces.put(done)
+
+        threading.Thread(target=run, daemon=True).start()
+        while True:
+            piece = pieces.get()
+            if piece is done:
+                break
+            yield SummaryDelta(stage, piece)
+        if "error" in outcome:
+            raise outcome["error"]
+        return outcome["value"]
+
+    def summarize_selected(self, entry, subject_area, audience_key, content_type, on_delta=None,
+                           priority=PRIORITY_INTERACTIVE):
+        """Single-entry summary, served from the shared entry summary store when another
+        session already summarized this link for the same audience (cost 0, cached=True)."""
+        key = (entry["link"], subject_area, audience_key, content_type, self.summarizer.model_for("entry"))
+        stored = self.entry_summary_store.get(*key)
+        if stored is not None:
+            if on_delta is not None:
+                on_delta(stored[0])
+            return {"cost": 0.0, "summary": stored[0], "entry": entry, "cached": True, "saved_cost": stored[1]}
+
+        summary, cost_info = self.summarizer.summarize_entry(
+            entry, subject_area, audience_key, content_type, on_delta, priority
+        )
+        self.entry_summary_store.put(*key, summary, cost_info)
         return {
             "cost": cost_info,
             "summary": summary,
-            "entry": entry
+            "entry": entry,
+            "cached": False,
         }
 
-    def summarize(self, subject_area, content_type, audience_key, days_limit=1, top_k=5, summarize_top_entries=False):
+    def summarize_entries(self, entries, subject_area, audience_key, content_type, priority=PRIORITY_BULK):
+        """summarize_selected() for several entries: stored summaries are reused and the rest
+        are summarized in batched LLM calls. Returns result dicts in entry order."""
+        model = self.summarizer.model_for("entry")
+        results, missing = [None] * len(entries), []
+        for i, entry in enumerate(entries):
+            stored = self.entry_summary_store.get(entry["link"], subject_area, audience_key, content_type, model)
+            if stored is None:
+                missing.append(i)
+            else:
+                results[i] = {"cost": 0.0, "summary": stored[0], "entry": entry, "cached": True, "saved_cost": stored[1]}
+
+        summaries = self.summarizer.summarize_entries(
+            [entries[i] for i in missing], subject_area, audience_key, content_type, priority
+        )
+        for i, (summary, cost_info) in zip(missing, summaries):
+            self.entry_summary_store.put(entries[i]["link"], subject_area, audience_key, content_type, model,
+                                         summary, cost_info)
+            results[i] = {"cost": cost_info, "summary": summary, "entry": entries[i], "cached": False}
+        return results
+
+    def iter_summarize_selected(self, entry, subject_area, audience_key, content_type):
+        """summarize_selected() as a stream: SummaryDelta events, then the result dict."""
+        result = yield from self._stream_call(
+            "entry", self.summarize_selected, entry, subject_area, audience_key, content_type
+        )
+        yield result
+
+    def summarize(self, subject_area, content_type, audience_key, days_limit=1, top_k=5, summarize_top_entries=False,
+                  fetch_deadline=FETCH_DEADLINE_SECONDS, max_entries=None, token_budget=None):
+        """Streams progress messages, SummaryDelta events and finally the result dict.
+        max_entries / token_budget cap what goes to the LLM after relevance ranking
+        (None: RANK_MAX_ENTRIES / RANK_TOKEN_BUDGET, 0: no cap)."""
         feeds = Config.SUBJECT_AREAS[subject_area][content_type]
         yield "📡 Fetching new entries from {} RSS feed(s)...".format(len(feeds))
+        self.last_seen_skipped = 0
+        self.use_seen_scope(subject_area, content_type, audience_key)
+        self.last_rank_stats = {}
+        max_entries = RANK_MAX_ENTRIES if max_entries is None else max_entries
+        token_budget = RANK_TOKEN_BUDGET if token_budget is None else token_budget
+        # Ranking needs every entry, so with a cap chunks are only cut once fetching is done
+        ranked = bool(max_entries or token_budget)
 
-        entries = self.get_new_entries(feeds, days_limit=days_limit)
-        total_entries = len(entries)
+        # Each feed's full chunks are sent as soon as it completes and go to the LLM in
+        # the background while slower feeds are still downloading; the feeds' leftover
+        # entries are packed together once fetching is done (see stable_chunks).
+        self.summarizer.chunks_reused = 0
+        self.summarizer.reset_stage_stats()
+        chunk_futures, tails = [], []
+        entries, duplicates = [], []
+        dupe_index = NearDuplicateIndex()
+        # Budgeted over the feed's whole window, so trimmed text (and chunk keys) stay stable
+        budget = EntryBudget(self.summarizer.model_for("map"))
+        with ThreadPoolExecutor(max_workers=self.summarizer.map_concurrency) as map_pool:
+            def submit_chunks(chunks):
+                for chunk in chunks:
+                    chunk_futures.append(map_pool.submit(
+                        self.summarizer.summarize_chunk, chunk, subject_area, audience_key, content_type, top_k
+                    ))
 
-        if not entries:
-            yield "⚠️ No new entries found."
-            yield {
-                "bulk_cost": None,
-                "bulk_summary": "No new articles found.",
-                "top_entries": [],
-                "raw_entries": [],
-                "total_entries": 0,
-            }
-            return
+            for url, feed_entries in self.iter_feed_windows(feeds, days_limit, subject_area, content_type, fetch_deadline):
+                new = []
+                for e in self._filter_new(budget.apply(feed_entries)):
+                    (new if dupe_index.add(e) is None else duplicates).append(e)
+                entries.extend(new)
+                yield f"   → {len(new)} new entries from {url}"
+                sent = len(chunk_futures)
+                if not ranked:
+                    full, feed_tails = split_stable_chunks(self.summarizer.model_for("map"), new)
+                    submit_chunks(full)
+                    tails.extend(feed_tails)
+                if len(chunk_futures) > sent:
+                    yield f"✍️ {len(chunk_futures)} chunk(s) sent for summarization so far..."
 
-        yield f"📰 {total_entries} entries fetched. Preparing summaries..."
-        yield "✍️ Summarizing chunks (this may take a few minutes)..."
-        chunked_summaries, chunked_cost = self.summarizer.summarize_bulk_chunks(
-            entries, subject_area, audience_key, content_type, top_k
-        )
+            entries.sort(key=lambda e: e["published"], reverse=True)
+            total_entries = len(entries)
+            stats = self.last_fetch_stats
+            yield f"🗄️ Feeds: {stats.get('fresh', 0)} pre-fetched, {stats.get('hits', 0)} unchanged, {stats.get('misses', 0)} refreshed, {stats.get('errors', 0)} failed, {stats.get('skipped', 0)} skipped (unhealthy)."
+            if stats.get("late"):
+                yield (f"⏱️ Fetch time budget of {fetch_deadline:.0f}s reached; {stats['late']} slow feed(s) "
+                       f"were served from cache where available and will be ready next time: {', '.join(stats['late_feeds'])}")
+            if self.last_seen_skipped:
+                yield f"👀 Skipped {self.last_seen_skipped} entries you have already had summarized."
+            self._record_duplicates(duplicates)
+            if duplicates:
+                yield f"🧹 Collapsed {len(duplicates)} near-duplicate entries (~{self.last_dedupe_stats['tokens_saved']} tokens saved)."
+            self._record_budget(budget, entries)
+            trimmed = self.last_budget_stats
+            if trimmed["tokens_saved"]:
+                yield (f"✂️ Trimmed {trimmed['trimmed_entries']} long summaries and "
+                       f"{trimmed['boilerplate_sentences']} boilerplate sentences (~{trimmed['tokens_saved']} tokens saved).")
+
+            if not entries:
+                yield "⚠️ No new entries found."
+                yield {
+                    "bulk_cost": None,
+                    "bulk_summary": "No new articles found.",
+                    "top_entries": [],
+                    "raw_entries": [],
+                    "total_entries": 0,
+                    "summarized_entries": 0,
+                    "late_feeds": stats.get("late_feeds", []),
+                }
+                return
+
+            yield f"📰 {total_entries} entries fetched. Preparing summaries..."
+            summarized = entries
+            if ranked:
+                summarized = self.select_relevant(entries, subject_area, audience_key, max_entries, token_budget)
+                if self.last_rank_stats["dropped"]:
+                    yield (f"🎯 Kept the {len(summarized)} most relevant of {total_entries} entries "
+                           f"(~{self.last_rank_stats['tokens_saved']} tokens saved).")
+                submit_chunks(stable_chunks(self.summarizer.model_for("map"), summarized))
+            else:
+                submit_chunks(pack_tails(self.summarizer.model_for("map"), tails))
+            yield "✍️ Summarizing chunks (this may take a few minutes)..."
+            chunked_summaries, chunked_cost, failed = collect_chunk_summaries(chunk_futures)
         yield f"✅ Chunked summaries completed. ({len(chunked_summaries)} chunks processed)"
+        if failed:
+            yield f"⚠️ {failed} chunk(s) failed after retries and were left out of the summary."
+        if self.summarizer.chunks_reused:
+            yield f"♻️ {self.summarizer.chunks_reused} of {len(chunked_summaries)} chunk summaries reused from earlier runs."
 
         yield "🧠 Creating overall summary across all chunks..."
-        bulk_summary, bulk_cost_info = self.summarizer.summarize_overall_summaries(
-            entries, chunked_summaries, subject_area, audience_key, top_k
+        bulk_summary, bulk_cost_info = yield from self._stream_call(
+            "bulk", self.summarizer.summarize_overall_summaries,
+            summarized, chunked_summaries, subject_area, audience_key, top_k
         )
+        if self.summarizer.last_reduce_levels > 1:
+            yield f"🌳 Reduced {len(chunked_summaries)} chunk summaries in {self.summarizer.last_reduce_levels} levels."
 
         yield "🔎 Extracting top trending or impactful entries..."
         selected_entries, selected_urls = extract_top_entries_from_summary(
-            bulk_summary, entries, max_count=top_k
+            bulk_summary, summarized, max_count=top_k
         )
 
         total_cost_info = chunked_cost + bulk_cost_info
 
         top_entries = []
         if summarize_top_entries and selected_entries:
-            yield "🧩 Summarizing top entries individually..."
-            for i, entry in enumerate(selected_entries):
-                yield f"   → Summarizing top entry {i+1}/{len(selected_entries)}..."
-                summary, cost_info = self.summarizer.summarize_entry(
-                    entry, subject_area, audience_key, content_type
-                )
-                top_entries.append({"cost": cost_info, "summary": summary, "entry": entry})
-                total_cost_info += cost_info
+            yield f"🧩 Summarizing {len(selected_entries)} top entries (batched)..."
+            top_entries = self.summarize_entries(selected_entries, subject_area, audience_key, content_type)
+            total_cost_info += sum(result["cost"] for result in top_entries)
 
+        self.commit_seen(summarized)
+        usage = getattr(self.summarizer.llm, "usage", None)
+        if usage and usage["cache_hits"]:
+            yield f"💾 {usage['cache_hits']} of {usage['calls']} LLM call(s) served from cache (saved ${usage['saved_cost']:.4f})."
+        if usage and usage["queue_wait"] >= 1:
+            yield f"⏳ Waited {usage['queue_wait']:.1f}s in the shared LLM queue."
+        stage_stats = self.summarizer.stage_report()
+        if stage_stats:
+            yield "💵 By stage: " + "; ".join(
+                f"{stage} ({s['model']}) {s['calls']} call(s), ${s['cost']:.4f}, {s['seconds']:.1f}s"
+                for stage, s in stage_stats.items()
+            )
         yield "✅ Summarization complete!"
         yield {
             "bulk_cost": total_cost_info,
@@ -85,38 +374,49 @@ class SummaryManager:
             "top_entries": top_entries,
             "raw_entries": entries,
             "total_entries": total_entries,
+            "summarized_entries": len(summarized),
+            "late_feeds": stats.get("late_feeds", []),
+            "stage_stats": stage_stats,
         }
 
-    def summarize1(self, subject_area, content_type, audience_key, days_limit=1, top_k=5, summarize_top_entries=False):
+    def summarize1(self, subject_area, content_type, audience_key, days_limit=1, top_k=5, summarize_top_entries=False,
+                   refresh=True, max_entries=None, token_budget=None):
 
-        # Fetch the feeds directly
+        # Fetch the feeds directly (refresh=False: read what is already in the entry store)
         feeds = Config.SUBJECT_AREAS[subject_area][content_type]
-        entries = self.get_new_entries(feeds, days_limit=days_limit)
+        self.use_seen_scope(subject_area, content_type, audience_key)
+        entries = self.get_new_entries(feeds, days_limit, subject_area, content_type, refresh=refresh)
 
         if not entries:
-            return {"bulk_cost": None, "bulk_summary": None, "top_entries": [], "raw_entries": []}
+            return {"bulk_cost": None, "bulk_summary": None, "top_entries": [], "raw_entries": [],
+                    "total_entries": 0, "summarized_entries": 0}
+
+        # raw_entries/total_entries report everything fetched; only the kept entries go to the LLM
+        summarized = self.select_relevant(entries, subject_area, audience_key, max_entries, token_budget)
 
         # Bulk summary
+        self.summarizer.reset_stage_stats()
 
-        chunked_summaries, chunked_cost = self.summarizer.summarize_bulk_chunks(entries, subject_area, audience_key, content_type, top_k)
+        chunked_summaries, chunked_cost = self.summarizer.summarize_bulk_chunks(summarized, subject_area, audience_key, content_type, top_k)
 
-        bulk_summary, bulk_cost_info = self.summarizer.summarize_overall_summaries(entries, chunked_summaries, subject_area, audience_key, top_k)
+        bulk_summary, bulk_cost_info = self.summarizer.summarize_overall_summaries(summarized, chunked_summaries, subject_area, audience_key, top_k)
 
-        selected_entries, selected_urls = extract_top_entries_from_summary(bulk_summary, entries, max_count=top_k)
+        selected_entries, selected_urls = extract_top_entries_from_summary(bulk_summary, summarized, max_count=top_k)
 
         total_cost_info = chunked_cost + bulk_cost_info
     
         top_entries = []
         if summarize_top_entries and selected_entries:
-            for entry in selected_entries:
-                summary, cost_info = self.summarizer.summarize_entry(entry, subject_area, audience_key, content_type)
-                top_entries.append({"cost": cost_info, "summary": summary,"entry": entry})
-                total_cost_info += cost_info
+            top_entries = self.summarize_entries(selected_entries, subject_area, audience_key, content_type)
+            total_cost_info += sum(result["cost"] for result in top_entries)
 
+        self.commit_seen(summarized)
         return {
             "bulk_cost": total_cost_info,
             "bulk_summary": bulk_summary,
             "top_entries": top_entries,
             "raw_entries": entries,
-            "total_entries": len(entries)
+            "total_entries": len(entries),
+            "summarized_entries": len(summarized),
+            "stage_stats": self.summarizer.stage_report(),
         }
@@ -0,0 +1,115 @@
+# app/text_extract.py
+import os
+import re
+import html
+import logging
+from html.entities import html5
+from bs4 import BeautifulSoup
+
+logger = logging.getLogger(__name__)
+
+# One piece of markup: a comment or script/style body (get_text() leaves both out), a
+# CDATA section (its text is kept) or a tag
+_MARKUP_RE = re.compile(
+    r"""<!--.*?-->|<(script|style|template)\b[^>]*>.*?</\1\s*>|<!\[CDATA\[(.*?)\]\]>"""
+    r"""|</?[A-Za-z](?:[^<>"']|"[^"]*"|'[^']*')*>""",
+    re.DOTALL | re.IGNORECASE,
+)
+_RAW_OPEN_RE = re.compile(r"<(script|style|template)\b", re.IGNORECASE)
+# Whitespace inside these is kept as-is by bs4, unlike everywhere else
+_PRESERVED_RE = re.compile(r"<(pre|textarea)\b", re.IGNORECASE)
+_ENTITY_RE = re.compile(r"&(?:#([0-9]{1,7})|#[xX]([0-9a-fA-F]{1,6})|([A-Za-z][A-Za-z0-9]*));")
+_ASCII_SPACES = "\x20\x0a\x09\x0c\x0d"
+
+
+def bs4_text(markup):
+    """Reference extractor: full html.parser tree, then get_text()."""
+    return BeautifulSoup(markup, "html.parser").get_text()
+
+
+def _plain_codepoint(cp):
+    # Control characters, C1 (windows-1252 remapped), surrogates and out-of-range
+    # references are decoded differently by html.unescape and html.parser
+    return cp in (9, 10) or (32 <= cp < 0x7F or 0x9F < cp <= 0x10FFFF) and not 0xD800 <= cp <= 0xDFFF
+
+
+def _unescape(text):
+    """html.unescape(text) when every '&' starts a well-formed entity whose decoding
+    bs4_text agrees with; None otherwise (bare '&', unterminated or unknown names)."""
+    for m in _ENTITY_RE.finditer(text):
+        decimal, hexadecimal, name = m.groups()
+        if name is not None:
+            if name + ";" not in html5:
+                return None
+        elif not _plain_codepoint(int(decimal) if decimal else int(hexadecimal, 16)):
+            return None
+    if "&" in _ENTITY_RE.sub("", text):
+        return None
+    return html.unescape(text)
+
+
+def _text_node(text):
+    """A run of text between tags as bs4 stores it: whitespace-only runs collapse to a
+    single newline or space."""
+    if text.strip(_ASCII_SPACES):
+        return text
+    return "\n" if "\n" in text else " "
+
+
+def _decode_run(text):
+    """Decoded text node for a run between tags, or None if bs4_text must decide."""
+    if "<" in text:
+        return None
+    if "&" in text:
+        text = _unescape(text)
+        if text is None:
+            return None
+    return _text_node(text)
+
+
+def fast_text(markup):
+    """Regex tag stripper matching bs4_text on ordinary feed summary HTML.
+
+    Anything it cannot handle with certainty (stray '<' or '&', doctype/processing
+    instructions, unterminated script/style, <pre>, unusual entities) is handed to
+    bs4_text instead.
+    """
+    if not markup:
+        return ""
+    if "<" in markup and _PRESERVED_RE.search(markup):
+        return bs4_text(markup)
+    out, pos = [], 0
+    for m in _MARKUP_RE.finditer(markup):
+        if m.start() > pos:
+            text = _decode_run(markup[pos:m.start()])
+            if text is None:
+                return bs4_text(markup)
+            out.append(text)
+        pos = m.end()
+        if m.group(2):
+            # CDATA is literal text: no entity decoding
+            out.append(_text_node(m.group(2)))
+        elif m.group(1) is None and _RAW_OPEN_RE.match(m.group(0)):
+            # Unterminated script/style - let the real parser decide where it ends
+            return bs4_text(markup)
+    if pos < len(markup):
+        text = _decode_run(markup[pos:])
+        if text is None:
+            return bs4_text(markup)
+        out.append(text)
+    return "".join(out)
+
+
+TEXT_EXTRACTORS = {
+    "fast": fast_text,
+    "bs4": bs4_text,
+}
+
+
+def get_text_extractor(name=None):
+    """Look up an extractor by name (default from TEXT_EXTRACTOR env, else "fast")."""
+    name = name or os.getenv("TEXT_EXTRACTOR", "fast")
+    if name not in TEXT_EXTRACTORS:
+        logger.warning(f"Unknown text extractor {name!r}, using 'fast'")
+        name = "fast"
+    return TEXT_EXTRACTORS[name]
@@ -21,15 +21,40 @@ MODEL_PRICING = {
     "gpt-4o-mini": {
         "input": 0.00015,
         "output": 0.00060
+    },
+    "gpt-4.1": {
+        "input": 0.002,
+        "output": 0.008
+    },
+    "gpt-4.1-mini": {
+        "input": 0.0004,
+        "output": 0.0016
+    },
+    "gpt-4.1-nano": {
+        "input": 0.0001,
+        "output": 0.0004
     }
 }
 
+def _pricing(model_name):
+    """Pricing for a model or a dated snapshot of it ("gpt-4o-mini-2024-07-18")."""
+    if model_name in MODEL_PRICING:
+        return MODEL_PRICING[model_name]
+    base = max((m for m in MODEL_PRICING if model_name.startswith(m + "-")), key=len, default=None)
+    if base is None:
+        raise ValueError(f"No pricing for model {model_name!r}; add it to MODEL_PRICING")
+    return MODEL_PRICING[base]
+
 def estimate_tokens(model_name, text):
-    enc = tiktoken.encoding_for_model(model_name)
+    try:
+        enc = tiktoken.encoding_for_model(model_name)
+    except KeyError:
+        # Models newer than the installed tiktoken use the gpt-4o tokenizer
+        enc = tiktoken.get_encoding("o200k_base")
     return len(enc.encode(text))
 
 def estimate_openai_cost(model_name, prompt_tokens, completion_tokens):
-    pricing = MODEL_PRICING.get(model_name) 
+    pricing = _pricing(model_name)
 
     input_cost = (prompt_tokens / 1000) * pricing["input"]
     output_cost = (completion_tokens / 1000) * pricing["output"]
@@ -0,0 +1,23 @@
+import sqlite3
+from datetime import datetime
+
+import pytest
+
+from src.entry_store import EntryStore
+
+
+def entry(i):
+    return {"title": f"t{i}", "link": f"https://example.org/{i}", "summary": "s",
+            "published": datetime(2026, 1, 1, 12, i)}
+
+
+def test_failed_upsert_rolls_back_and_store_stays_usable(tmp_path):
+    store = EntryStore(str(tmp_path / "entries.db"))
+    with pytest.raises(sqlite3.Error):
+        # A list is not a bindable SQLite value, so executemany fails mid-transaction
+        store.upsert_entries([entry(1)], "https://feed", subject=["bad"])
+    assert not store._conn.in_transaction
+
+    assert store.upsert_entries([entry(2)], "https://feed", "astro", "news") == 1
+    links = [e["link"] for e in store.query_window(["https://feed"], datetime(2026, 1, 1))]
+    assert links == ["https://example.org/2"]
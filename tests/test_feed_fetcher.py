@@ -0,0 +1,153 @@
+import time
+import threading
+import http.server
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import pytest
+
+from src.feed_cache import FeedCache
+from src.feed_fetcher import FeedFetcher
+from src.feed_health import FeedHealth
+from src.rss_utils import iter_recent_entries
+
+ETAG = '"v1"'
+
+
+def make_feed(count=3):
+    now = datetime.now(timezone.utc)
+    items = "".join(
+        f"<item><title>Item {i}</title><link>https://example.org/{i}</link>"
+        f"<pubDate>{format_datetime(now - timedelta(hours=i), usegmt=True)}</pubDate>"
+        f"<description>&lt;p&gt;Body {i}&lt;/p&gt;</description></item>"
+        for i in range(count)
+    )
+    return f'<?xml version="1.0"?><rss version="2.0"><channel><title>t</title>{items}</channel></rss>'.encode()
+
+
+class FeedServer(http.server.ThreadingHTTPServer):
+    """Local feed server that records connections, requests and peak concurrency."""
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), FeedHandler)
+        self.body = make_feed()
+        self.delay = 0.0
+        self.connections = 0
+        self.requests = []
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.lock = threading.Lock()
+
+    def process_request(self, request, client_address):
+        with self.lock:
+            self.connections += 1
+        super().process_request(request, client_address)
+
+    def url(self, path="/feed.xml"):
+        return f"http://127.0.0.1:{self.server_address[1]}{path}"
+
+
+class FeedHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requests.append(dict(self.headers))
+            server.in_flight += 1
+            server.peak_in_flight = max(server.peak_in_flight, server.in_flight)
+        try:
+            time.sleep(server.delay)
+            if self.headers.get("If-None-Match") == ETAG:
+                self.send_response(304)
+                self.send_header("ETag", ETAG)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "application/rss+xml")
+            self.send_header("ETag", ETAG)
+            self.send_header("Content-Length", str(len(server.body)))
+            self.end_headers()
+            self.wfile.write(server.body)
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+
+@pytest.fixture
+def server():
+    srv = FeedServer()
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    yield srv
+    srv.shutdown()
+    srv.server_close()
+
+
+@pytest.fixture
+def fetcher():
+    f = FeedFetcher(timeout=5, per_host_limit=4)
+    yield f
+    f.close()
+
+
+def test_fetches_reuse_pooled_connection(server, fetcher):
+    for _ in range(5):
+        result = fetcher.fetch_sync(server.url())
+        assert result["status"] == 200
+        assert result["content"] == server.body
+    assert len(server.requests) == 5
+    assert server.connections == 1
+
+
+def test_conditional_get_returns_304(server, fetcher):
+    first = fetcher.fetch_sync(server.url())
+    assert first["etag"] == ETAG
+
+    second = fetcher.fetch_sync(server.url(), etag=first["etag"])
+    assert second["status"] == 304
+    assert second["error"] is None
+    assert second["content"] == b""
+    assert server.requests[-1]["If-None-Match"] == ETAG
+
+
+def test_not_modified_feed_is_served_from_cache(server, fetcher, tmp_path):
+    cache = FeedCache(str(tmp_path))
+    kwargs = dict(cache=cache, fetcher=fetcher, health=FeedHealth())
+
+    [(_, fetched, status)] = list(iter_recent_entries([server.url()], **kwargs))
+    assert status == "miss"
+    assert [e["title"] for e in fetched] == ["Item 0", "Item 1", "Item 2"]
+
+    [(_, reused, status)] = list(iter_recent_entries([server.url()], **kwargs))
+    assert status == "hit"
+    assert [e["link"] for e in reused] == [e["link"] for e in fetched]
+    assert cache.hits == 1 and cache.misses == 1
+
+
+def test_timeout_is_reported_as_error(server):
+    server.delay = 1.0
+    fetcher = FeedFetcher(timeout=0.2)
+    try:
+        result = fetcher.fetch_sync(server.url())
+    finally:
+        fetcher.close()
+    assert result["status"] is None
+    assert "Timeout" in result["error"]
+
+
+def test_per_host_limit_caps_concurrent_requests(server):
+    server.delay = 0.3
+    fetcher = FeedFetcher(timeout=5, per_host_limit=2)
+    try:
+        futures = [fetcher.submit(server.url(f"/feed{i}.xml")) for i in range(6)]
+        results = [f.result(timeout=10) for f in futures]
+    finally:
+        fetcher.close()
+    assert all(r["status"] == 200 for r in results)
+    assert server.peak_in_flight == 2
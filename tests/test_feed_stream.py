@@ -0,0 +1,30 @@
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+from src.feed_stream import iter_feed_items
+
+NOW = datetime(2026, 10, 18, 12, 0, tzinfo=timezone.utc)
+
+
+def rss(ages_in_days):
+    items = "".join(
+        f"<item><title>{i}</title><link>https://example.org/{i}</link>"
+        f"<pubDate>{format_datetime(NOW - timedelta(days=age), usegmt=True)}</pubDate></item>"
+        for i, age in enumerate(ages_in_days)
+    )
+    return f'<rss version="2.0"><channel><title>t</title>{items}</channel></rss>'.encode("utf-8")
+
+
+def titles(content, days=1):
+    cutoff = (NOW - timedelta(days=days)).replace(tzinfo=None)
+    return [item["title"] for item in iter_feed_items(content, cutoff)]
+
+
+def test_newest_first_feed_stops_after_the_window():
+    # The recent item after three old ones is past the early stop
+    assert titles(rss([0.1, 0.2, 5, 6, 7, 0.3])) == ["0", "1"]
+
+
+def test_old_pinned_items_do_not_hide_new_ones():
+    # Three old items pinned at the top, themselves newest first
+    assert titles(rss([10, 20, 30, 0.1, 0.2, 5, 6, 7])) == ["3", "4"]
@@ -0,0 +1,46 @@
+import time
+import asyncio
+
+from src.llm_client import _ClientRegistry
+
+
+def test_idle_sync_clients_are_closed():
+    registry = _ClientRegistry(max_size=4, idle_seconds=0.01)
+    old = registry.get("sk-a")
+    time.sleep(0.05)
+    assert registry.get("sk-a") is not old
+    assert old.is_closed()
+
+
+def test_lru_eviction_closes_the_dropped_client():
+    registry = _ClientRegistry(max_size=1, idle_seconds=600)
+    old = registry.get("sk-a")
+    registry.get("sk-b")
+    assert old.is_closed()
+
+
+def test_async_clients_do_not_crowd_out_sync_clients():
+    registry = _ClientRegistry(max_size=2, idle_seconds=600)
+    sync_client = registry.get("sk-a")
+
+    async def get_async():
+        return registry.get("sk-a", use_async=True)
+
+    for _ in range(5):
+        asyncio.run(get_async())
+
+    assert registry.get("sk-a") is sync_client
+    assert not sync_client.is_closed()
+    # Every asyncio.run() loop is closed by now, so its client was dropped
+    registry.get("sk-b")
+    assert len(registry._async_clients) == 0
+
+
+def test_async_client_reused_within_a_loop():
+    registry = _ClientRegistry(max_size=2, idle_seconds=600)
+
+    async def twice():
+        return registry.get("sk-a", use_async=True), registry.get("sk-a", use_async=True)
+
+    first, second = asyncio.run(twice())
+    assert first is second
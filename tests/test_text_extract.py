@@ -0,0 +1,54 @@
+from pathlib import Path
+
+import pytest
+
+from src.text_extract import bs4_text, fast_text
+
+FIXTURES = sorted((Path(__file__).parent / "fixtures" / "feed_html").glob("*.html"))
+
+# Entity and markup edge cases where a naive regex + html.unescape path drifts from bs4
+EDGE_CASES = [
+    "a &notit; b",
+    "x &amp y",
+    "&ampx",
+    "AT&T",
+    "&copy 2024",
+    "&copy2024",
+    "&#x27",
+    "a &unknown; b",
+    "a &notin b",
+    "1 &lt 2 &gt 0",
+    "&Amp;",
+    "&#0;",
+    "&#13;",
+    "&#128;",
+    "&#xD800;",
+    "&#x1F600; ok",
+    "<p>a &amp; b &hellip;</p>",
+    "<a href='x?a=1&b=2'>link</a> R&D",
+    "<b>bold</b> 3 < 4",
+    "<p>unterminated <script>var x = 1;",
+    "<!DOCTYPE html><p>doc</p>",
+    "<span>a</span> &#32; <span>b</span>",
+    "<p>one</p>\n  \n<p>two</p>",
+    "<pre>  keep\n  spacing  </pre>",
+    "<![CDATA[ raw &amp; ]]> after",
+    "   ",
+    "",
+    "plain text",
+]
+
+
+def test_fixtures_exist():
+    assert len(FIXTURES) >= 10
+
+
+@pytest.mark.parametrize("path", FIXTURES, ids=[p.stem for p in FIXTURES])
+def test_fast_text_matches_bs4_on_feed_html(path):
+    markup = path.read_text(encoding="utf-8")
+    assert fast_text(markup) == bs4_text(markup)
+
+
+@pytest.mark.parametrize("markup", EDGE_CASES)
+def test_fast_text_matches_bs4_on_edge_cases(markup):
+    assert fast_text(markup) == bs4_text(markup)